@@ -0,0 +1,29 @@
+"""User is_admin
+
+Revision ID: 0adde5b8b6c9
+Revises: bf7a96649248
+Create Date: 2026-10-18 21:05:12.418306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0adde5b8b6c9'
+down_revision: Union[str, Sequence[str], None] = 'bf7a96649248'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('user', sa.Column('is_admin', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('is_admin')
@@ -0,0 +1,62 @@
+"""Store branch grid cells
+
+Revision ID: 32d08c7b9c53
+Revises: 8c9f38fab82f
+Create Date: 2026-10-18 10:12:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from database.geo import grid_cell
+
+
+# revision identifiers, used by Alembic.
+revision: str = '32d08c7b9c53'
+down_revision: Union[str, Sequence[str], None] = '8c9f38fab82f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('store_branch', sa.Column('lat_cell', sa.Integer(), nullable=True))
+    op.add_column('store_branch', sa.Column('lon_cell', sa.Integer(), nullable=True))
+
+    # preenche as células das filiais já cadastradas
+    store_branch = sa.table(
+        'store_branch',
+        sa.column('id', sa.Integer),
+        sa.column('latitude', sa.Float),
+        sa.column('longitude', sa.Float),
+        sa.column('lat_cell', sa.Integer),
+        sa.column('lon_cell', sa.Integer),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(store_branch.c.id, store_branch.c.latitude, store_branch.c.longitude)
+    ).all()
+    if rows:
+        bind.execute(
+            store_branch.update()
+                .where(store_branch.c.id == sa.bindparam('b_id'))
+                .values(lat_cell=sa.bindparam('b_lat_cell'), lon_cell=sa.bindparam('b_lon_cell')),
+            [
+                {'b_id': id, 'b_lat_cell': grid_cell(lat), 'b_lon_cell': grid_cell(lon)}
+                for id, lat, lon in rows
+            ]
+        )
+
+    with op.batch_alter_table('store_branch') as batch_op:
+        batch_op.alter_column('lat_cell', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('lon_cell', existing_type=sa.Integer(), nullable=False)
+    op.create_index('ix_store_branch_cell', 'store_branch', ['lat_cell', 'lon_cell'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_store_branch_cell', table_name='store_branch')
+    op.drop_column('store_branch', 'lon_cell')
+    op.drop_column('store_branch', 'lat_cell')
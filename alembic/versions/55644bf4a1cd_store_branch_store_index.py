@@ -0,0 +1,28 @@
+"""Store branch store index
+
+Revision ID: 55644bf4a1cd
+Revises: 805fe83d4fe8
+Create Date: 2026-10-18 22:14:09.551873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '55644bf4a1cd'
+down_revision: Union[str, Sequence[str], None] = '805fe83d4fe8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_store_branch_store', 'store_branch', ['id_store'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_store_branch_store', table_name='store_branch')
@@ -0,0 +1,73 @@
+"""Offer archive own id
+
+Revision ID: 5e89635c4765
+Revises: 55644bf4a1cd
+Create Date: 2026-10-18 22:41:27.318604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e89635c4765'
+down_revision: Union[str, Sequence[str], None] = '55644bf4a1cd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DATA_COLUMNS = ['id_product', 'id_store_branch', 'current_price', 'previous_price', 'expiration', 'archived_at']
+
+
+# Recria offer_archive com outra chave primária (trocá-la no lugar não é portável entre os
+# bancos): a nova tabela é criada com outro nome, recebe as linhas e substitui a antiga
+def _recreate_offer_archive(id_column, extra_columns, insert_columns, select_sql):
+    op.create_table('offer_archive_new',
+        id_column,
+        *extra_columns,
+        sa.Column('id_product', sa.Integer(), nullable=False),
+        sa.Column('id_store_branch', sa.Integer(), nullable=False),
+        sa.Column('current_price', sa.Float(), nullable=False),
+        sa.Column('previous_price', sa.Float(), nullable=True),
+        sa.Column('expiration', sa.Date(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['id_product'], ['product.id'], onupdate='CASCADE', ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['id_store_branch'], ['store_branch.id'], onupdate='CASCADE', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(f'INSERT INTO offer_archive_new ({", ".join(insert_columns)}) {select_sql}')
+
+    op.drop_index(op.f('ix_offer_archive_id_product'), table_name='offer_archive')
+    op.drop_table('offer_archive')
+    op.rename_table('offer_archive_new', 'offer_archive')
+    op.create_index(op.f('ix_offer_archive_id_product'), 'offer_archive', ['id_product'], unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # o id antigo (o da oferta) vai para id_offer; o id novo é gerado pelo banco
+    columns = ', '.join(DATA_COLUMNS)
+    _recreate_offer_archive(
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        [sa.Column('id_offer', sa.Integer(), nullable=False)],
+        ['id_offer', *DATA_COLUMNS],
+        f'SELECT id, {columns} FROM offer_archive ORDER BY id',
+    )
+    op.create_index(op.f('ix_offer_archive_id_offer'), 'offer_archive', ['id_offer'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_offer_archive_id_offer'), table_name='offer_archive')
+
+    # o id volta a ser o da oferta; de um id arquivado mais de uma vez fica o arquivamento mais recente
+    columns = ', '.join(DATA_COLUMNS)
+    _recreate_offer_archive(
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        [],
+        ['id', *DATA_COLUMNS],
+        f'SELECT id_offer, {columns} FROM offer_archive '
+        f'WHERE id IN (SELECT MAX(id) FROM offer_archive GROUP BY id_offer)',
+    )
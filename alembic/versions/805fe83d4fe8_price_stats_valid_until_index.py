@@ -0,0 +1,28 @@
+"""Price stats valid_until index
+
+Revision ID: 805fe83d4fe8
+Revises: 0adde5b8b6c9
+Create Date: 2026-10-18 21:32:48.270193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '805fe83d4fe8'
+down_revision: Union[str, Sequence[str], None] = '0adde5b8b6c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_product_price_stats_valid_until'), 'product_price_stats', ['valid_until'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_product_price_stats_valid_until'), table_name='product_price_stats')
@@ -0,0 +1,117 @@
+"""Offer unique per product and branch
+
+Revision ID: 90de0f97198c
+Revises: f3f8c8066a7d
+Create Date: 2026-10-18 16:41:12.608394
+
+"""
+from typing import Sequence, Union
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '90de0f97198c'
+down_revision: Union[str, Sequence[str], None] = 'f3f8c8066a7d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# ids por comando (limite de parâmetros dos bancos)
+CHUNK_SIZE = 500
+
+offer = sa.table(
+    'offer',
+    sa.column('id', sa.Integer),
+    sa.column('id_product', sa.Integer),
+    sa.column('id_store_branch', sa.Integer),
+    sa.column('current_price', sa.Float),
+    sa.column('expiration', sa.Date),
+)
+stats = sa.table(
+    'product_price_stats',
+    sa.column('id_product', sa.Integer),
+    sa.column('min_price', sa.Float),
+    sa.column('avg_price', sa.Float),
+    sa.column('offer_count', sa.Integer),
+    sa.column('id_best_offer', sa.Integer),
+    sa.column('discount_pct', sa.Float),
+    sa.column('valid_until', sa.Date),
+)
+
+
+# Recalcula as estatísticas de preço (só ofertas válidas) dos produtos informados,
+# como em database.price_stats
+def _refresh_price_stats(product_ids):
+    today = date.today()
+    avg_price = sa.func.avg(offer.c.current_price)
+    min_price = sa.func.min(offer.c.current_price)
+
+    for i in range(0, len(product_ids), CHUNK_SIZE):
+        chunk = product_ids[i:i + CHUNK_SIZE]
+        op.execute(stats.delete().where(stats.c.id_product.in_(chunk)))
+        op.execute(
+            stats.insert().from_select(
+                ['id_product', 'min_price', 'avg_price', 'offer_count', 'discount_pct', 'valid_until'],
+                sa.select(
+                    offer.c.id_product,
+                    min_price,
+                    avg_price,
+                    sa.func.count(offer.c.id),
+                    sa.case((avg_price == 0, 0), else_=(avg_price - min_price) * 100 / avg_price),
+                    sa.func.min(offer.c.expiration),
+                )
+                .where(offer.c.expiration >= today, offer.c.id_product.in_(chunk))
+                .group_by(offer.c.id_product)
+            )
+        )
+        op.execute(
+            stats.update()
+            .where(stats.c.id_product.in_(chunk))
+            .values(
+                id_best_offer=(
+                    sa.select(sa.func.min(offer.c.id))
+                    .where(
+                        offer.c.id_product == stats.c.id_product,
+                        offer.c.current_price == stats.c.min_price,
+                        offer.c.expiration >= today
+                    )
+                    .scalar_subquery()
+                )
+            )
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # produtos com mais de uma oferta na mesma filial
+    product_ids = op.get_bind().execute(
+        sa.select(offer.c.id_product)
+        .group_by(offer.c.id_product, offer.c.id_store_branch)
+        .having(sa.func.count(offer.c.id) > 1)
+        .distinct()
+    ).scalars().all()
+
+    # mantém só uma oferta de cada produto em cada filial: a de maior validade (e, no empate,
+    # a mais recente, de maior id)
+    position = sa.func.row_number().over(
+        partition_by=(offer.c.id_product, offer.c.id_store_branch),
+        order_by=(offer.c.expiration.desc(), offer.c.id.desc()),
+    ).label('position')
+    ranked = sa.select(offer.c.id, position).subquery()
+    survivors = sa.select(ranked.c.id).where(ranked.c.position == 1).subquery()
+    op.execute(offer.delete().where(offer.c.id.not_in(sa.select(survivors.c.id))))
+
+    # as estatísticas podiam apontar (id_best_offer) para ofertas removidas
+    _refresh_price_stats(sorted(set(product_ids)))
+
+    with op.batch_alter_table('offer') as batch_op:
+        batch_op.create_unique_constraint('uq_offer_product_branch', ['id_product', 'id_store_branch'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('offer') as batch_op:
+        batch_op.drop_constraint('uq_offer_product_branch', type_='unique')
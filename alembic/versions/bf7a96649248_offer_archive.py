@@ -0,0 +1,41 @@
+"""Offer archive
+
+Revision ID: bf7a96649248
+Revises: 90de0f97198c
+Create Date: 2026-10-18 17:20:36.104512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bf7a96649248'
+down_revision: Union[str, Sequence[str], None] = '90de0f97198c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('offer_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('id_product', sa.Integer(), nullable=False),
+        sa.Column('id_store_branch', sa.Integer(), nullable=False),
+        sa.Column('current_price', sa.Float(), nullable=False),
+        sa.Column('previous_price', sa.Float(), nullable=True),
+        sa.Column('expiration', sa.Date(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['id_product'], ['product.id'], onupdate='CASCADE', ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['id_store_branch'], ['store_branch.id'], onupdate='CASCADE', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_offer_archive_id_product'), 'offer_archive', ['id_product'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_offer_archive_id_product'), table_name='offer_archive')
+    op.drop_table('offer_archive')
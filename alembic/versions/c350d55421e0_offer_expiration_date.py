@@ -0,0 +1,50 @@
+"""Offer expiration as DATE
+
+Revision ID: c350d55421e0
+Revises: e2538eff98bf
+Create Date: 2026-10-18 14:26:09.531877
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c350d55421e0'
+down_revision: Union[str, Sequence[str], None] = 'e2538eff98bf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _change_type(table, column, from_type, to_type, nullable=False):
+    # copia os valores para uma coluna nova do tipo destino e troca as colunas;
+    # no SQLite o texto YYYY-MM-DD é copiado como está (um CAST para DATE o estragaria)
+    tmp_column = f'{column}_tmp'
+    op.add_column(table, sa.Column(tmp_column, to_type, nullable=True))
+
+    t = sa.table(table, sa.column(column, from_type), sa.column(tmp_column, to_type))
+    value = t.c[column] if op.get_bind().dialect.name == 'sqlite' else sa.cast(t.c[column], to_type)
+    op.execute(t.update().values({tmp_column: value}))
+
+    with op.batch_alter_table(table) as batch_op:
+        batch_op.drop_column(column)
+        batch_op.alter_column(tmp_column,
+               new_column_name=column,
+               existing_type=to_type,
+               nullable=nullable)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _change_type('offer', 'expiration', sa.String(length=10), sa.Date())
+    op.create_index('ix_offer_expiration', 'offer', ['expiration'])
+    _change_type('product_price_stats', 'valid_until', sa.String(length=10), sa.Date())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _change_type('product_price_stats', 'valid_until', sa.Date(), sa.String(length=10))
+    op.drop_index('ix_offer_expiration', table_name='offer')
+    _change_type('offer', 'expiration', sa.Date(), sa.String(length=10))
@@ -0,0 +1,90 @@
+"""Product price stats
+
+Revision ID: e2538eff98bf
+Revises: 32d08c7b9c53
+Create Date: 2026-10-18 11:03:47.918260
+
+"""
+from typing import Sequence, Union
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2538eff98bf'
+down_revision: Union[str, Sequence[str], None] = '32d08c7b9c53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('product_price_stats',
+        sa.Column('id_product', sa.Integer(), nullable=False),
+        sa.Column('min_price', sa.Float(), nullable=False),
+        sa.Column('avg_price', sa.Float(), nullable=False),
+        sa.Column('offer_count', sa.Integer(), nullable=False),
+        sa.Column('id_best_offer', sa.Integer(), nullable=True),
+        sa.Column('discount_pct', sa.Float(), nullable=False),
+        sa.Column('valid_until', sa.String(length=10), nullable=False),
+        sa.ForeignKeyConstraint(['id_product'], ['product.id'], onupdate='CASCADE', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id_product')
+    )
+
+    # preenche com as ofertas válidas já cadastradas
+    offer = sa.table(
+        'offer',
+        sa.column('id', sa.Integer),
+        sa.column('id_product', sa.Integer),
+        sa.column('current_price', sa.Float),
+        sa.column('expiration', sa.String),
+    )
+    stats = sa.table(
+        'product_price_stats',
+        sa.column('id_product', sa.Integer),
+        sa.column('min_price', sa.Float),
+        sa.column('avg_price', sa.Float),
+        sa.column('offer_count', sa.Integer),
+        sa.column('id_best_offer', sa.Integer),
+        sa.column('discount_pct', sa.Float),
+        sa.column('valid_until', sa.String),
+    )
+    today = str(date.today())
+    avg_price = sa.func.avg(offer.c.current_price)
+    min_price = sa.func.min(offer.c.current_price)
+
+    op.execute(
+        stats.insert().from_select(
+            ['id_product', 'min_price', 'avg_price', 'offer_count', 'discount_pct', 'valid_until'],
+            sa.select(
+                offer.c.id_product,
+                min_price,
+                avg_price,
+                sa.func.count(offer.c.id),
+                sa.case((avg_price == 0, 0), else_=(avg_price - min_price) * 100 / avg_price),
+                sa.func.min(offer.c.expiration),
+            )
+            .where(offer.c.expiration >= today)
+            .group_by(offer.c.id_product)
+        )
+    )
+    op.execute(
+        stats.update().values(
+            id_best_offer=(
+                sa.select(sa.func.min(offer.c.id))
+                .where(
+                    offer.c.id_product == stats.c.id_product,
+                    offer.c.current_price == stats.c.min_price,
+                    offer.c.expiration >= today
+                )
+                .scalar_subquery()
+            )
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('product_price_stats')
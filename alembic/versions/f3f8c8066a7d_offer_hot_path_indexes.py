@@ -0,0 +1,32 @@
+"""Offer hot path indexes
+
+Revision ID: f3f8c8066a7d
+Revises: c350d55421e0
+Create Date: 2026-10-18 15:02:44.176320
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3f8c8066a7d'
+down_revision: Union[str, Sequence[str], None] = 'c350d55421e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_offer_branch_expiration', 'offer', ['id_store_branch', 'expiration', 'id_product', 'current_price'])
+    op.create_index('ix_offer_product_price', 'offer', ['id_product', 'current_price'])
+    op.create_index('ix_product_category', 'product', ['id_category'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_product_category', table_name='product')
+    op.drop_index('ix_offer_product_price', table_name='offer')
+    op.drop_index('ix_offer_branch_expiration', table_name='offer')
@@ -0,0 +1,32 @@
+# Ambiente dos benchmarks: importar antes de qualquer módulo da aplicação.
+# O banco é sempre o SQLite local de BENCHMARK_DATABASE_URL (nunca o DATABASE_URL do .env),
+# pois o gerador recria as tabelas.
+import os
+
+BENCHMARK_DATABASE_URL = os.getenv("BENCHMARK_DATABASE_URL", "sqlite:///benchmarks/bench.sqlite")
+
+os.environ["DATABASE_URL"] = BENCHMARK_DATABASE_URL
+os.environ["ASYNC_DATABASE_URL"] = ""
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+# cache de respostas desligado: mede o caminho até o banco (RESPONSE_CACHE=memory no ambiente liga)
+os.environ.setdefault("RESPONSE_CACHE", "off")
+
+# cidades (nome, latitude, longitude) em torno das quais as filiais são geradas
+CITIES = [
+    ("São Paulo", -23.5505, -46.6333),
+    ("Rio de Janeiro", -22.9068, -43.1729),
+    ("Belo Horizonte", -19.9167, -43.9345),
+    ("Brasília", -15.7939, -47.8828),
+    ("Salvador", -12.9777, -38.5016),
+    ("Fortaleza", -3.7319, -38.5267),
+    ("Curitiba", -25.4284, -49.2733),
+    ("Recife", -8.0476, -34.8770),
+    ("Porto Alegre", -30.0346, -51.2177),
+    ("Manaus", -3.1190, -60.0217),
+]
+
+# usuário criado pelo gerador para o cenário de login
+BENCHMARK_USER_EMAIL = "benchmark@qtota.local"
+BENCHMARK_USER_PASSWORD = "benchmark"
@@ -0,0 +1,341 @@
+from benchmarks.env import CITIES
+
+import main
+from database.database import AsyncSessionLocal, Base
+from database.models import MeasureType, Store, StoreBranch, Product, Offer
+from database.geo import NEARBY_RADIUS_KM, grid_cell, register_geo_functions
+from routes.geo_index import StoreBranchIndex, store_branch_index
+from routes.utils import get_nearby_store_branches, get_nearby_store_branches_query, get_store_products_query, get_distance_expression, get_product_filters, get_product_load_plan, load_offers_catalog, process_products, serialize_products, haversine, haversine_batch
+from routes.product_routes import export_lines
+from schemas import ProductSchema
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.orm import Session, aliased, contains_eager
+from datetime import date, datetime, timedelta
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import timeit
+import tracemalloc
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+# Menor tempo médio (ms) por chamada entre `repeat` rodadas de `number` chamadas
+def best_ms(fn, number: int, repeat: int = 5) -> float:
+    return round(min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1000, 4)
+
+async def best_ms_async(fn, number: int, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = asyncio.get_running_loop().time()
+        for _ in range(number):
+            await fn()
+        timings.append((asyncio.get_running_loop().time() - started) / number)
+    return round(min(timings) * 1000, 4)
+
+# Distâncias de 1000 ofertas: haversine escalar por oferta x uma passada vetorizada
+def bench_haversine(rng) -> dict:
+    lat, lon = CITIES[0][1:]
+    lats = [rng.gauss(lat, 0.05) for _ in range(1000)]
+    lons = [rng.gauss(lon, 0.05) for _ in range(1000)]
+    return {
+        "offers": 1000,
+        "scalar_ms": best_ms(lambda: [haversine(lat, lon, a, b) for a, b in zip(lats, lons)], 20),
+        "batch_ms": best_ms(lambda: haversine_batch(lat, lon, lats, lons).tolist(), 20),
+    }
+
+# Página de 50 produtos com 20 ofertas: jsonable_encoder + json x modelo Pydantic
+def bench_serialization() -> dict:
+    page = [
+        {
+            "id": i, "name": f"Product {i}", "description": "d", "measure": 1, "measure_type": MeasureType.WEIGHT,
+            "type": "t", "origin": "o", "expiration": 3,
+            "stores": [
+                {
+                    "id": j, "name": "Store", "branch": "Branch", "current_price": 9.9, "discount_percentage": 10,
+                    "previous_price": None, "expiration_offer": date.today(), "logo": None, "distance": 1234,
+                }
+                for j in range(20)
+            ],
+        }
+        for i in range(50)
+    ]
+    adapter = TypeAdapter(list[ProductSchema])
+    return {
+        "products": 50,
+        "offers_per_product": 20,
+        "jsonable_encoder_ms": best_ms(lambda: json.dumps(jsonable_encoder(page)).encode(), 20),
+        "pydantic_ms": best_ms(lambda: adapter.dump_json(adapter.validate_python(page)), 20),
+    }
+
+# Filiais próximas: índice em memória x consulta SQL com pré-filtro pelas células
+async def bench_nearby(rng) -> dict:
+    positions = [(rng.gauss(lat, 0.05), rng.gauss(lon, 0.05)) for _, lat, lon in CITIES]
+
+    async with AsyncSessionLocal() as session:
+        await session.run_sync(store_branch_index.build)
+
+        async def nearby_all():
+            for lat, lon in positions:
+                await get_nearby_store_branches(lat, lon, session)
+
+        index_ms = await best_ms_async(nearby_all, 10)
+        store_branch_index.ready = False
+        try:
+            sql_ms = await best_ms_async(nearby_all, 10)
+        finally:
+            store_branch_index.ready = True
+
+    return {
+        "lookups": len(positions),
+        "index_ms": round(index_ms / len(positions), 4),
+        "sql_ms": round(sql_ms / len(positions), 4),
+    }
+
+# Filiais próximas com catálogos sintéticos maiores (SQLite em memória): índice em memória x
+# consulta SQL com pré-filtro pelas células, para cada número de filiais. As filiais ficam
+# espalhadas (desvio de NEARBY_SCALING_SPREAD graus) em torno das cidades e os usuários perto
+# do centro delas.
+NEARBY_SCALING_SPREAD = 1.0
+NEARBY_SCALING_STORES = 50
+NEARBY_SCALING_CHUNK_SIZE = 50_000
+
+def bench_nearby_scaling(rng, sizes) -> list:
+    positions = [(rng.gauss(lat, 0.05), rng.gauss(lon, 0.05)) for _, lat, lon in CITIES for _ in range(2)]
+    results = []
+    for branches in sizes:
+        engine = create_engine("sqlite://")
+        register_geo_functions(engine)
+        Base.metadata.create_all(engine, tables=[Store.__table__, StoreBranch.__table__])
+
+        with engine.begin() as connection:
+            connection.execute(insert(Store), [
+                {"id": i, "name": f"Store {i}"} for i in range(1, NEARBY_SCALING_STORES + 1)
+            ])
+            for start in range(0, branches, NEARBY_SCALING_CHUNK_SIZE):
+                rows = []
+                for i in range(start + 1, min(start + NEARBY_SCALING_CHUNK_SIZE, branches) + 1):
+                    _, lat, lon = CITIES[i % len(CITIES)]
+                    latitude = rng.gauss(lat, NEARBY_SCALING_SPREAD)
+                    longitude = rng.gauss(lon, NEARBY_SCALING_SPREAD)
+                    rows.append({
+                        "id": i, "id_store": rng.randint(1, NEARBY_SCALING_STORES), "description": "Branch",
+                        "latitude": latitude, "longitude": longitude,
+                        "lat_cell": grid_cell(latitude), "lon_cell": grid_cell(longitude),
+                    })
+                connection.execute(insert(StoreBranch), rows)
+
+        with Session(engine) as session:
+            index = StoreBranchIndex()
+            started = timeit.default_timer()
+            index.build(session)
+            build_ms = (timeit.default_timer() - started) * 1000
+
+            def index_all():
+                for lat, lon in positions:
+                    index.nearby(lat, lon, NEARBY_RADIUS_KM)
+
+            def sql_all():
+                for lat, lon in positions:
+                    session.execute(get_nearby_store_branches_query(lat, lon, NEARBY_RADIUS_KM)).all()
+
+            found = sum(len(index.nearby(lat, lon, NEARBY_RADIUS_KM)) for lat, lon in positions)
+            results.append({
+                "branches": branches,
+                "lookups": len(positions),
+                "found_per_lookup": round(found / len(positions), 1),
+                "index_build_ms": round(build_ms, 1),
+                "index_ms": round(best_ms(index_all, 3, repeat=3) / len(positions), 4),
+                "sql_ms": round(best_ms(sql_all, 3, repeat=3) / len(positions), 4),
+            })
+        engine.dispose()
+    return results
+
+# Consulta anterior de list_products_by_store: subquery correlacionada com o menor preço
+# do produto na loja, reavaliada para cada oferta da query externa
+def correlated_store_products_query(id_store, lat, lon):
+    SB2 = aliased(StoreBranch)
+    O2 = aliased(Offer)
+    P = aliased(Product)
+    SB3 = aliased(StoreBranch)
+    O3 = aliased(Offer)
+
+    subq = (
+        select(func.min(O3.current_price))
+        .join(SB3, SB3.id == O3.id_store_branch)
+        .where(O3.id_product == O2.id_product, SB3.id_store == id_store)
+        .scalar_subquery()
+    )
+    distance_expr = get_distance_expression(lat, lon, SB2.latitude, SB2.longitude)
+    return (
+        select(P.id, distance_expr)
+        .select_from(SB2)
+        .join(O2, O2.id_store_branch == SB2.id)
+        .join(P, P.id == O2.id_product)
+        .where(O2.current_price == subq)
+        .order_by(distance_expr, P.id)
+    )
+
+# Primeira página dos produtos de uma loja (subquery correlacionada x CTE com ROW_NUMBER()),
+# num SQLite em memória com STORE_PRODUCTS_STORES lojas de `products` produtos, cada um ofertado em
+# todas as filiais: as ofertas por loja crescem com o número de filiais
+STORE_PRODUCTS_STORES = 2
+
+def bench_store_products(rng, branches_per_store=(5, 10, 20, 40, 80), products: int = 200) -> list:
+    _, lat, lon = CITIES[0]
+    today = date.today()
+    results = []
+    for branches in branches_per_store:
+        engine = create_engine("sqlite://")
+        register_geo_functions(engine)
+        Base.metadata.create_all(engine)
+
+        store_branches = []
+        for id_store in range(1, STORE_PRODUCTS_STORES + 1):
+            for _ in range(branches):
+                latitude, longitude = rng.gauss(lat, 0.05), rng.gauss(lon, 0.05)
+                store_branches.append({
+                    "id": len(store_branches) + 1, "id_store": id_store, "description": "Branch",
+                    "latitude": latitude, "longitude": longitude,
+                    "lat_cell": grid_cell(latitude), "lon_cell": grid_cell(longitude),
+                })
+        with engine.begin() as connection:
+            connection.execute(insert(Store), [{"id": i, "name": f"Store {i}"} for i in range(1, STORE_PRODUCTS_STORES + 1)])
+            connection.execute(insert(StoreBranch), store_branches)
+            connection.execute(insert(Product), [
+                {"id": i, "name": f"Product {i}", "description": "d", "measure": 1, "measure_type": MeasureType.WEIGHT,
+                 "type": "t", "origin": "o", "expiration": 1}
+                for i in range(1, products + 1)
+            ])
+            connection.execute(insert(Offer), [
+                {"id_product": i, "id_store_branch": branch["id"], "current_price": round(rng.uniform(2, 80), 2),
+                 "expiration": today + timedelta(days=30)}
+                for i in range(1, products + 1)
+                for branch in store_branches
+            ])
+
+        with Session(engine) as session:
+            def first_page(query):
+                return lambda: session.execute(query.limit(20)).all()
+            results.append({
+                "offers_per_store": products * branches,
+                "correlated_ms": best_ms(first_page(correlated_store_products_query(1, lat, lon)), 3, repeat=3),
+                "cte_ms": best_ms(first_page(get_store_products_query(1, lat, lon)), 3, repeat=3),
+            })
+        engine.dispose()
+    return results
+
+# Caminho anterior de /product: carrega todos os produtos com ofertas válidas nas filiais
+# próximas, ordena pelo desconto em Python e fatia a página
+async def python_sorted_products(nearby_store_branches, id_category, lat, lon, page, limit, session):
+    def calculate_discount_pct(offers):
+        prices = [offer.current_price for offer in offers if offer.current_price is not None]
+        if not prices:
+            return 0
+        min_price = min(prices)
+        avg_price = sum(prices) / len(prices)
+        if avg_price == 0:
+            return 0
+        return ((avg_price - min_price) / avg_price) * 100
+
+    products = (await session.scalars(
+        select(Product)
+            .join(Offer, Offer.id_product == Product.id)
+            .where(*get_product_filters(nearby_store_branches, id_category))
+            .options(*get_product_load_plan(contains_eager(Product.offers)))
+    )).unique().all()
+    sorted_products = sorted(products, key=lambda p: calculate_discount_pct(p.offers), reverse=True)
+
+    start = (page - 1) * limit
+    page_products = sorted_products[start:start + limit]
+    await load_offers_catalog([o for p in page_products for o in p.offers], session)
+    return serialize_products(page_products, lat, lon)
+
+# Página de /product (20 produtos, primeira e décima páginas) no banco de benchmark:
+# ordenação e paginação no banco x caminho anterior com a ordenação em Python.
+# Tempo médio por página e pico de memória (tracemalloc) de uma página.
+async def bench_product_ranking(rng, limit: int = 20, pages=(1, 10)) -> list:
+    positions = [(rng.gauss(lat, 0.02), rng.gauss(lon, 0.02)) for _, lat, lon in CITIES]
+    paths = {"sql": process_products, "python_sort": python_sorted_products}
+    results = []
+
+    async with AsyncSessionLocal() as session:
+        nearby = [(lat, lon, await get_nearby_store_branches(lat, lon, session)) for lat, lon in positions]
+
+        for page in pages:
+            result = {"page": page, "limit": limit, "lookups": len(nearby)}
+            for name, path in paths.items():
+                async def all_pages():
+                    for lat, lon, branches in nearby:
+                        await path(branches, None, lat, lon, page, limit, session)
+
+                result[f"{name}_ms"] = round(await best_ms_async(all_pages, 3, repeat=3) / len(nearby), 4)
+
+                peak_kib = 0
+                for lat, lon, branches in nearby:
+                    session.expunge_all()
+                    tracemalloc.start()
+                    try:
+                        await path(branches, None, lat, lon, page, limit, session)
+                        peak_kib = max(peak_kib, tracemalloc.get_traced_memory()[1] // 1024)
+                    finally:
+                        tracemalloc.stop()
+                result[f"{name}_peak_kib"] = peak_kib
+            results.append(result)
+
+    return results
+
+# Pico de memória (tracemalloc) da exportação NDJSON: deve ficar limitado, qualquer que seja o
+# número de produtos exportados
+async def bench_export_memory(limit_kib: int) -> dict:
+    _, lat, lon = CITIES[0]
+    products = 0
+    tracemalloc.start()
+    try:
+        async for chunk in export_lines(None, lat, lon):
+            products += chunk.count(b"\n")
+        peak_kib = tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+    return {"products": products, "peak_kib": peak_kib, "limit_kib": limit_kib, "ok": peak_kib <= limit_kib}
+
+async def run_micro(seed: int, export_limit_kib: int, nearby_sizes) -> dict:
+    rng = random.Random(seed)
+    return {
+        "haversine": bench_haversine(rng),
+        "serialization": bench_serialization(),
+        "nearby": await bench_nearby(rng),
+        "nearby_scaling": bench_nearby_scaling(rng, nearby_sizes),
+        "store_products": bench_store_products(rng),
+        "product_ranking": await bench_product_ranking(rng),
+        "export_memory": await bench_export_memory(export_limit_kib),
+    }
+
+# rodar no terminal (depois de python -m benchmarks.seed): python -m benchmarks.micro
+# sai com código 1 se o pico de memória da exportação passar de --export-limit-kib
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro benchmarks of the hot paths")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--export-limit-kib", type=int, default=16384)
+    parser.add_argument("--nearby-sizes", default="10000,100000,1000000", help="Branch counts of the nearby scaling benchmark")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "micro": asyncio.run(run_micro(args.seed, args.export_limit_kib, [int(size) for size in args.nearby_sizes.split(",")])),
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"micro-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+    print(json.dumps(results["micro"], indent=2))
+    print(f"saved to {output}")
+    if not results["micro"]["export_memory"]["ok"]:
+        raise SystemExit(1)
@@ -0,0 +1,197 @@
+from benchmarks.env import BENCHMARK_DATABASE_URL, CITIES, BENCHMARK_USER_EMAIL, BENCHMARK_USER_PASSWORD
+
+import main
+from cache import RESPONSE_CACHE
+from database.database import engine, async_engine
+from database.models import Product
+from sqlalchemy import event, select, func
+from datetime import datetime
+
+import argparse
+import asyncio
+import httpx
+import json
+import numpy as np
+import os
+import random
+import subprocess
+import time
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+# variação (graus) da posição do usuário em torno do centro da cidade
+USER_SPREAD = 0.05
+
+# Requisições de cada cenário: função (rng, max_product_id) -> (método, url, kwargs do httpx)
+def _position(rng):
+    _, lat, lon = rng.choice(CITIES)
+    return round(rng.gauss(lat, USER_SPREAD), 6), round(rng.gauss(lon, USER_SPREAD), 6)
+
+def home_request(rng, max_product_id):
+    lat, lon = _position(rng)
+    return "GET", "/home/", {"params": {"lat": lat, "lon": lon}}
+
+def products_request(rng, max_product_id):
+    lat, lon = _position(rng)
+    return "GET", "/product/", {"params": {"lat": lat, "lon": lon, "page": rng.randint(1, 3), "limit": 20}}
+
+def product_request(rng, max_product_id):
+    lat, lon = _position(rng)
+    return "GET", f"/product/{rng.randint(1, max_product_id)}", {"params": {"lat": lat, "lon": lon}}
+
+# lista de compras: 40 produtos numa requisição (em vez de 40 GET /product/{id})
+def batch_request(rng, max_product_id):
+    lat, lon = _position(rng)
+    ids = [rng.randint(1, max_product_id) for _ in range(40)]
+    return "POST", "/product/batch", {"json": {"ids": ids, "lat": lat, "lon": lon}}
+
+def stores_request(rng, max_product_id):
+    lat, lon = _position(rng)
+    return "GET", "/store/nearby", {"params": {"lat": lat, "lon": lon, "limit": 5}}
+
+def login_request(rng, max_product_id):
+    return "POST", "/auth/login", {"json": {"email": BENCHMARK_USER_EMAIL, "password": BENCHMARK_USER_PASSWORD}}
+
+# logins (bcrypt) concorrendo com a página inicial: 1 login para cada 4 /home
+def mixed_request(rng, max_product_id):
+    if rng.random() < 0.2:
+        return login_request(rng, max_product_id)
+    return home_request(rng, max_product_id)
+
+SCENARIOS = {
+    "home": home_request,
+    "products": products_request,
+    "product": product_request,
+    "batch": batch_request,
+    "stores": stores_request,
+    "login": login_request,
+    "mixed": mixed_request,
+}
+
+# comandos SQL executados pelo engine da aplicação (por cenário)
+_statements = [0]
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    _statements[0] += 1
+
+async def run_scenario(client, name: str, requests: int, concurrency: int, warmup: int, seed: int, max_product_id: int) -> dict:
+    rng = random.Random(f"{seed}:{name}")
+    planned = [SCENARIOS[name](rng, max_product_id) for _ in range(warmup + requests)]
+
+    for method, url, kwargs in planned[:warmup]:
+        await client.request(method, url, **kwargs)
+
+    latencies = []
+    errors = 0
+    pending = iter(planned[warmup:])
+
+    async def worker():
+        nonlocal errors
+        for method, url, kwargs in pending:
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    _statements[0] = 0
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 2),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "statements_per_request": round(_statements[0] / requests, 2),
+    }
+
+async def run_benchmarks(scenarios, requests: int, login_requests: int, concurrency: int, warmup: int, seed: int) -> dict:
+    with engine.connect() as connection:
+        max_product_id = connection.execute(select(func.max(Product.id))).scalar()
+    if not max_product_id:
+        raise SystemExit("Empty benchmark database: run python -m benchmarks.seed first")
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _count_statement)
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for name in scenarios:
+            count = login_requests if name == "login" else requests
+            results[name] = await run_scenario(client, name, count, concurrency, warmup, seed, max_product_id)
+    event.remove(async_engine.sync_engine, "before_cursor_execute", _count_statement)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Variação percentual de cada métrica em relação a um resultado anterior
+# (rps: maior é melhor; latências e comandos: menor é melhor)
+def compare(results: dict, baseline: dict) -> dict:
+    changes = {}
+    for name, current in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        changes[name] = {
+            metric: f"{(current[metric] - previous[metric]) / previous[metric] * 100:+.1f}%"
+            for metric in ("rps", "p50_ms", "p95_ms", "p99_ms", "statements_per_request")
+            if previous[metric]
+        }
+    return changes
+
+# rodar no terminal (depois de python -m benchmarks.seed):
+# python -m benchmarks.run [--scenarios home,product] [--requests 500] [--concurrency 10] [--baseline benchmarks/results/<arquivo>.json]
+# com o cache de respostas: RESPONSE_CACHE=memory python -m benchmarks.run
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency/throughput benchmark through an in-process ASGI client")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "database": BENCHMARK_DATABASE_URL,
+            "response_cache": RESPONSE_CACHE,
+            "store_branch_index": main.STORE_BRANCH_INDEX,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "scenarios": asyncio.run(run_benchmarks(
+            scenarios, args.requests, args.login_requests, args.concurrency, args.warmup, args.seed
+        )),
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+    print(json.dumps(results["scenarios"], indent=2))
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            print(json.dumps(compare(results, json.load(file)), indent=2))
+    print(f"saved to {output}")
@@ -0,0 +1,115 @@
+from benchmarks.env import BENCHMARK_DATABASE_URL, CITIES, BENCHMARK_USER_EMAIL, BENCHMARK_USER_PASSWORD
+
+import main
+from database.database import Base, engine
+from database.models import Category, Store, StoreBranch, Product, Offer, User, MeasureType
+from database.price_stats import refresh_product_price_stats
+from database.geo import grid_cell
+from sqlalchemy import insert
+from datetime import date, timedelta
+
+import argparse
+import json
+import random
+import time
+
+# desvio padrão (graus, ~5 km) das filiais em torno do centro da cidade
+CITY_SPREAD = 0.05
+INSERT_CHUNK_SIZE = 5000
+
+# Catálogo sintético e reprodutível (mesma semente, mesmos dados): lojas, filiais agrupadas
+# em torno de cidades reais, categorias, produtos e ofertas. As ofertas de cada produto ficam
+# em filiais de uma mesma cidade, com parte delas já expirada.
+def generate_catalog(stores: int, branches: int, categories: int, products: int, offers_per_product: int, seed: int = 1):
+    rng = random.Random(seed)
+    today = date.today()
+
+    catalog = {
+        "category": [{"id": i, "name": f"Category {i}"} for i in range(1, categories + 1)],
+        "store": [{"id": i, "name": f"Store {i}", "logo": f"https://cdn.qtota.local/logo/{i}.png"} for i in range(1, stores + 1)],
+        "store_branch": [],
+        "product": [],
+        "offer": [],
+    }
+
+    branches_by_city = {city: [] for city, _, _ in CITIES}
+    for i in range(1, branches + 1):
+        city, lat, lon = CITIES[(i - 1) % len(CITIES)]
+        latitude = rng.gauss(lat, CITY_SPREAD)
+        longitude = rng.gauss(lon, CITY_SPREAD)
+        catalog["store_branch"].append({
+            "id": i,
+            "id_store": rng.randint(1, stores),
+            "description": f"{city} #{i}",
+            "latitude": latitude,
+            "longitude": longitude,
+            "lat_cell": grid_cell(latitude),
+            "lon_cell": grid_cell(longitude),
+        })
+        branches_by_city[city].append(i)
+
+    measure_types = list(MeasureType)
+    for i in range(1, products + 1):
+        catalog["product"].append({
+            "id": i,
+            "name": f"Product {i}",
+            "description": f"Synthetic product {i}",
+            "measure": rng.choice([1, 200, 500, 1000]),
+            "measure_type": rng.choice(measure_types),
+            "type": "synthetic",
+            "origin": "benchmark",
+            "expiration": rng.randint(1, 365),
+            "id_category": rng.randint(1, categories),
+        })
+
+        city_branches = branches_by_city[rng.choice(CITIES)[0]]
+        base_price = rng.uniform(2, 80)
+        for id_store_branch in rng.sample(city_branches, min(offers_per_product, len(city_branches))):
+            current_price = round(base_price * rng.uniform(0.6, 1.2), 2)
+            catalog["offer"].append({
+                "id_product": i,
+                "id_store_branch": id_store_branch,
+                "current_price": current_price,
+                "previous_price": round(current_price * 1.1, 2) if rng.random() < 0.3 else None,
+                "expiration": today + timedelta(days=rng.randint(-5, 30)),
+            })
+
+    return catalog
+
+# Recria as tabelas do banco de benchmark e grava o catálogo
+def seed_database(catalog: dict):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        for model in (Category, Store, StoreBranch, Product, Offer):
+            rows = catalog[model.__tablename__]
+            for i in range(0, len(rows), INSERT_CHUNK_SIZE):
+                connection.execute(insert(model), rows[i:i + INSERT_CHUNK_SIZE])
+
+        connection.execute(insert(User), [{
+            "name": "Benchmark",
+            "email": BENCHMARK_USER_EMAIL,
+            "password": main.bcrypt_context.hash(BENCHMARK_USER_PASSWORD),
+        }])
+        refresh_product_price_stats(connection)
+
+# rodar no terminal: python -m benchmarks.seed [--products 5000] [--offers-per-product 20] ...
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the local benchmark database with a synthetic catalog")
+    parser.add_argument("--stores", type=int, default=20)
+    parser.add_argument("--branches", type=int, default=500)
+    parser.add_argument("--categories", type=int, default=15)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--offers-per-product", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    catalog = generate_catalog(args.stores, args.branches, args.categories, args.products, args.offers_per_product, args.seed)
+    seed_database(catalog)
+    print(json.dumps({
+        "database": BENCHMARK_DATABASE_URL,
+        **{table: len(rows) for table, rows in catalog.items()},
+        "seconds": round(time.perf_counter() - started, 3),
+    }, indent=2))
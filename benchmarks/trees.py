@@ -0,0 +1,166 @@
+from benchmarks.env import BENCHMARK_DATABASE_URL
+from benchmarks.run import SCENARIOS
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.engine import make_url
+from database.models import Product
+from datetime import datetime
+
+import argparse
+import json
+import numpy as np
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+# Compara revisões do app (ex.: antes e depois de uma mudança de arquitetura) com a mesma carga:
+# as requisições vêm dos geradores de benchmarks/run.py, e cada revisão roda num git worktree
+# próprio, num processo separado, contra o mesmo banco. Serve para revisões antigas, que não têm
+# os benchmarks nem o async_engine (as rotas síncronas também respondem pelo ASGITransport).
+
+# Processo de cada revisão: executado com python -c dentro do worktree; recebe as requisições
+# no stdin e devolve as latências (segundos) no stdout
+WORKER = """
+import asyncio
+import httpx
+import json
+import sys
+import time
+
+import main
+
+async def run(job):
+    planned = job["planned"]
+    latencies = []
+    errors = 0
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+        for method, url, kwargs in planned[:job["warmup"]]:
+            await client.request(method, url, **kwargs)
+
+        pending = iter(planned[job["warmup"]:])
+
+        async def worker():
+            nonlocal errors
+            for method, url, kwargs in pending:
+                started = time.perf_counter()
+                response = await client.request(method, url, **kwargs)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(job["concurrency"])])
+        elapsed = time.perf_counter() - started
+    return {"latencies": latencies, "errors": errors, "seconds": elapsed}
+
+print(json.dumps(asyncio.run(run(json.load(sys.stdin)))))
+"""
+
+def plan_requests(name: str, requests: int, warmup: int, seed: int, max_product_id: int) -> list:
+    rng = random.Random(f"{seed}:{name}")
+    return [SCENARIOS[name](rng, max_product_id) for _ in range(warmup + requests)]
+
+def run_tree(tree: str, database_url: str, job: dict) -> dict:
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        ASYNC_DATABASE_URL="",
+        SECRET_KEY="benchmark",
+        ALGORITHM="HS256",
+        ACCESS_TOKEN_EXPIRE_MINUTES="30",
+        RESPONSE_CACHE="off",
+    )
+    process = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", WORKER], cwd=tree, env=env, input=json.dumps(job), capture_output=True, text=True
+    )
+    # um processo que morre (ex.: segfault) entra no resultado em vez de derrubar a comparação
+    if process.returncode != 0:
+        return {"concurrency": job["concurrency"], "returncode": process.returncode, "stderr": process.stderr[-2000:]}
+
+    result = json.loads(process.stdout.splitlines()[-1])
+    latencies = result["latencies"]
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "requests": len(latencies),
+        "concurrency": job["concurrency"],
+        "errors": result["errors"],
+        "seconds": round(result["seconds"], 3),
+        "rps": round(len(latencies) / result["seconds"], 1),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+    }
+
+def git(*args) -> str:
+    return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+
+def compare_revisions(revisions, scenarios, concurrencies, requests: int, warmup: int, seed: int) -> dict:
+    # caminho absoluto: cada revisão roda no diretório do seu worktree
+    url = make_url(BENCHMARK_DATABASE_URL)
+    database_url = str(url.set(database=os.path.abspath(url.database)))
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        max_product_id = connection.execute(select(func.max(Product.id))).scalar()
+    engine.dispose()
+    if not max_product_id:
+        raise SystemExit("Empty benchmark database: run python -m benchmarks.seed first")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for index, revision in enumerate(revisions):
+            tree = os.path.join(directory, f"tree-{index}")
+            git("worktree", "add", "--detach", tree, revision)
+            try:
+                commit = git("-C", tree, "rev-parse", "--short", "HEAD")
+                results[revision] = {"commit": commit, "subject": git("-C", tree, "log", "-1", "--format=%s"), "scenarios": {}}
+                for name in scenarios:
+                    planned = plan_requests(name, requests, warmup, seed, max_product_id)
+                    results[revision]["scenarios"][name] = [
+                        run_tree(tree, database_url, {"planned": planned, "warmup": warmup, "concurrency": concurrency})
+                        for concurrency in concurrencies
+                    ]
+            finally:
+                git("worktree", "remove", "--force", tree)
+    return results
+
+# rodar no terminal (depois de python -m benchmarks.seed), com as revisões a comparar:
+# python -m benchmarks.trees <revisão> [<revisão> ...] [--scenarios home,products] [--concurrency 1,10] [--output <arquivo>.json]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare git revisions of the app under the same request load")
+    parser.add_argument("revisions", nargs="+")
+    parser.add_argument("--scenarios", default="home,products")
+    parser.add_argument("--concurrency", default="1,10")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "database": BENCHMARK_DATABASE_URL,
+            "response_cache": "off",
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "revisions": compare_revisions(
+            args.revisions, scenarios, [int(c) for c in args.concurrency.split(",")], args.requests, args.warmup, args.seed
+        ),
+    }
+
+    output = args.output or os.path.join("benchmarks", "results", f"trees-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+    print(json.dumps(results["revisions"], indent=2))
+    print(f"saved to {output}")
@@ -0,0 +1,211 @@
+from database.geo import NEARBY_RADIUS_KM, bounding_box, grid_cell
+from database.models import Offer, StoreBranch
+from routes.geo_index import store_branch_index
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from collections import OrderedDict
+from threading import Lock
+from pydantic_core import to_json
+
+import hashlib
+import json
+import os
+import time
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "memory").lower()  # memory | redis | off
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "60"))  # segundos
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+REDIS_URL = os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+
+# Backend em memória do processo com TTL e despejo LRU.
+# Os contadores de versão ficam fora do LRU para nunca voltarem a zero.
+class MemoryCacheBackend:
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expira_em, valor)
+        self._counters = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counters(self, keys):
+        return [self._counters.get(key, 0) for key in keys]
+
+    def size(self):
+        return len(self._entries)
+
+# Backend compatível com Redis (qualquer cliente com get/mget/set/incr, ex.: redis-py ou fakeredis).
+# Os valores são gravados em JSON (datas, enums e modelos Pydantic incluídos).
+# O despejo LRU fica a cargo do servidor: use maxmemory-policy volatile-lru, assim só as
+# entradas (que têm TTL) são despejadas e os contadores de versão são preservados.
+class RedisCacheBackend:
+
+    def __init__(self, client, prefix: str = "qtota:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, to_json(value), ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def counters(self, keys):
+        return [int(value or 0) for value in self.client.mget([self.prefix + key for key in keys])]
+
+    def size(self):
+        return None
+
+# Cache das respostas das listagens, com chave pelas filiais no raio do usuário.
+# Cada região da grade (database.geo.grid_cell) tem um contador de versão: mudanças em
+# ofertas ou filiais incrementam a versão das regiões afetadas e as entradas antigas
+# deixam de ser encontradas (e saem pelo TTL/LRU).
+class ResponseCache:
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    # A resposta das listagens depende só do conjunto de filiais no raio do usuário (ranking,
+    # ofertas e categorias); as distâncias são recalculadas para a posição exata a cada
+    # requisição (routes.utils.with_offer_distances). A chave leva esse conjunto, em vez de
+    # uma posição aproximada, e a versão da região do usuário.
+    def key(self, endpoint: str, lat: float, lon: float, store_branch_ids, *params):
+        if not self.enabled:
+            return None
+        region = f"{grid_cell(lat)}:{grid_cell(lon)}"
+        generation, version = self.backend.counters(["version", f"version:{region}"])
+        branches = hashlib.sha1(",".join(map(str, sorted(store_branch_ids))).encode()).hexdigest()
+        return ":".join([endpoint, f"g{generation}", f"v{version}", branches, *map(str, params)])
+
+    def get(self, key: str):
+        if key is None:
+            return None
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value):
+        if key is not None:
+            self.backend.set(key, value, self.ttl)
+
+    # Invalida as regiões cujos usuários enxergam uma filial em (lat, lon)
+    def invalidate_area(self, lat: float, lon: float):
+        if not self.enabled:
+            return
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, NEARBY_RADIUS_KM)
+        for i_lat in range(grid_cell(min_lat), grid_cell(max_lat) + 1):
+            for i_lon in range(grid_cell(min_lon), grid_cell(max_lon) + 1):
+                self.backend.incr(f"version:{i_lat}:{i_lon}")
+
+    def invalidate_all(self):
+        if self.enabled:
+            self.backend.incr("version")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.enabled else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0,
+            "entries": self.backend.size() if self.enabled else 0,
+        }
+
+def create_response_cache():
+    if RESPONSE_CACHE == "redis":
+        import redis
+        backend = RedisCacheBackend(redis.Redis.from_url(REDIS_URL))
+    elif RESPONSE_CACHE == "memory":
+        backend = MemoryCacheBackend(RESPONSE_CACHE_MAX_ENTRIES)
+    else:
+        backend = None
+    return ResponseCache(backend, RESPONSE_CACHE_TTL)
+
+response_cache = create_response_cache()
+
+# Invalidação: as áreas afetadas são acumuladas na sessão e aplicadas após o commit
+def _pending_invalidations(target):
+    return object_session(target).info.setdefault("response_cache_invalidations", set())
+
+def _old_value(target, attr):
+    history = inspect(target).attrs[attr].history
+    return history.deleted[0] if history.deleted else getattr(target, attr)
+
+@event.listens_for(StoreBranch, "after_insert")
+@event.listens_for(StoreBranch, "after_update")
+@event.listens_for(StoreBranch, "after_delete")
+def _invalidate_store_branch(mapper, connection, branch):
+    pending = _pending_invalidations(branch)
+    pending.add((branch.latitude, branch.longitude))
+    pending.add((_old_value(branch, "latitude"), _old_value(branch, "longitude")))
+
+@event.listens_for(Offer, "after_insert")
+@event.listens_for(Offer, "after_update")
+@event.listens_for(Offer, "after_delete")
+def _invalidate_offer(mapper, connection, offer):
+    pending = _pending_invalidations(offer)
+    for id_store_branch in {offer.id_store_branch, _old_value(offer, "id_store_branch")}:
+        # sem a localização da filial no índice, invalida tudo
+        pending.add(store_branch_index.location(id_store_branch) or "all")
+
+# Para gravações em lote (que não disparam os eventos do ORM): agenda a invalidação
+# das áreas das filiais informadas para o próximo commit da sessão
+def invalidate_store_branches_on_commit(session, store_branch_ids):
+    pending = session.info.setdefault("response_cache_invalidations", set())
+    for id_store_branch in store_branch_ids:
+        pending.add(store_branch_index.location(id_store_branch) or "all")
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session):
+    for area in session.info.pop("response_cache_invalidations", ()):
+        if area == "all":
+            response_cache.invalidate_all()
+        else:
+            response_cache.invalidate_area(*area)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session):
+    session.info.pop("response_cache_invalidations", None)
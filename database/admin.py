@@ -0,0 +1,28 @@
+from database.models import User
+from sqlalchemy import select
+
+# Concede (ou revoga) a permissão administrativa de um usuário pelo e-mail.
+# Retorna False se o usuário não existe.
+def set_admin(session, email: str, is_admin: bool = True) -> bool:
+    user = session.scalar(select(User).where(User.email == email))
+    if user is None:
+        return False
+    user.is_admin = is_admin
+    session.commit()
+    return True
+
+# rodar no terminal: python -m database.admin usuario@email [--revoke]
+if __name__ == "__main__":
+    from database.database import SessionLocal
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Grant or revoke the admin permission (offer ingestion)")
+    parser.add_argument("email")
+    parser.add_argument("--revoke", action="store_true")
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        if not set_admin(session, args.email, not args.revoke):
+            raise SystemExit(f"User not found: {args.email}")
+    print(f"{args.email}: admin {'revoked' if args.revoke else 'granted'}")
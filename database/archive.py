@@ -0,0 +1,89 @@
+from database.models import Offer, OfferArchive
+from database.price_stats import refresh_expired_price_stats
+from sqlalchemy import select, insert, delete, literal
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from datetime import date, datetime
+
+import time
+
+# ofertas movidas por transação: cada lote trava poucas linhas e por pouco tempo
+ARCHIVE_BATCH_SIZE = 1000
+
+# Relatório da última execução (exposto em /metrics/archive)
+last_report = None
+
+# Move as ofertas expiradas antes de `before` (padrão: hoje) de offer para offer_archive,
+# em lotes de batch_size com um commit por lote. Uma falha fica registrada em last_report
+# ("error") e é repassada.
+def archive_expired_offers(session: Session, before: date = None, batch_size: int = ARCHIVE_BATCH_SIZE):
+    global last_report
+
+    started = time.perf_counter()
+    before = before or date.today()
+    archived_at = datetime.now()
+    moved = batches = refreshed = 0
+
+    def report(error=None):
+        return {
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "before": before.isoformat(),
+            "moved": moved,
+            "batches": batches,
+            "price_stats_refreshed": refreshed,
+            "seconds": round(time.perf_counter() - started, 3),
+            "error": error,
+        }
+
+    # o id da oferta vai para id_offer; o id do arquivo é gerado pelo banco
+    columns = ["id_product", "id_store_branch", "current_price", "previous_price", "expiration"]
+    try:
+        while True:
+            ids = session.scalars(
+                select(Offer.id)
+                    .where(Offer.expiration < before)
+                    .order_by(Offer.id)
+                    .limit(batch_size)
+            ).all()
+            if not ids:
+                break
+
+            session.execute(
+                insert(OfferArchive).from_select(
+                    ["id_offer", *columns, "archived_at"],
+                    select(Offer.id, *[Offer.__table__.c[column] for column in columns], literal(archived_at))
+                        .where(Offer.id.in_(ids))
+                )
+            )
+            session.execute(delete(Offer).where(Offer.id.in_(ids)).execution_options(synchronize_session=False))
+            session.commit()
+            moved += len(ids)
+            batches += 1
+
+        # as estatísticas de preço que ainda contavam ofertas expiradas são recalculadas
+        refreshed = refresh_expired_price_stats(session.connection())
+        session.commit()
+    except SQLAlchemyError as exc:
+        # os lotes já confirmados ficam arquivados; o erro vai para o relatório e para quem chamou
+        session.rollback()
+        last_report = report(f"{type(exc).__name__}: {getattr(exc, 'orig', None) or exc}")
+        raise
+
+    last_report = report()
+    return last_report
+
+# rodar no terminal: python -m database.archive [--before AAAA-MM-DD] [--batch-size 1000]
+if __name__ == "__main__":
+    from database.database import SessionLocal
+
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Move expired offers to offer_archive")
+    parser.add_argument("--before", type=date.fromisoformat)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        report = archive_expired_offers(session, args.before, args.batch_size)
+    print(json.dumps(report, indent=2))
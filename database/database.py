@@ -1,12 +1,67 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from database.pool import InstrumentedAsyncQueuePool
+from database.geo import register_geo_functions
+from dotenv import load_dotenv
 import os
 
+load_dotenv()
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# configuração do pool de conexões
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # segundos
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # segundos
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# driver assíncrono usado por padrão para cada banco
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "mysql": "aiomysql",
+    "postgresql": "asyncpg",
+    "mssql": "aioodbc",
+}
+
+# URL do engine assíncrono: ASYNC_DATABASE_URL ou DATABASE_URL com o driver assíncrono
+def get_async_database_url():
+    async_url = os.getenv("ASYNC_DATABASE_URL")
+    if async_url:
+        return async_url
+    url = make_url(DATABASE_URL)
+    return url.set(drivername=f"{url.get_backend_name()}+{ASYNC_DRIVERS[url.get_backend_name()]}")
+
+# Opções do pool; o SQLite em memória usa um pool próprio e fica com o padrão
+def get_pool_options(url):
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+# engine síncrono: migrações, scripts e tarefas de manutenção
+engine = create_engine(DATABASE_URL, pool_pre_ping=DB_POOL_PRE_PING, pool_recycle=DB_POOL_RECYCLE)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# engine assíncrono: rotas da API, com o pool instrumentado
+async_pool_options = get_pool_options(get_async_database_url())
+if async_pool_options:
+    async_pool_options["poolclass"] = InstrumentedAsyncQueuePool
+async_engine = create_async_engine(get_async_database_url(), **async_pool_options)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# geo_distance nas conexões SQLite
+register_geo_functions(engine)
+register_geo_functions(async_engine.sync_engine)
+
 Base = declarative_base()
 
 Base.metadata.create_all(bind=engine)
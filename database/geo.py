@@ -0,0 +1,95 @@
+from sqlalchemy import Float, event, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
+
+import math
+import numpy as np
+
+# raio médio da Terra em km
+EARTH_RADIUS_KM = 6371.0
+
+# raio de busca padrão das filiais próximas (km)
+NEARBY_RADIUS_KM = 10
+# raio máximo da busca das k lojas mais próximas (o raio dobra a partir do NEARBY_RADIUS_KM)
+NEAREST_STORES_MAX_RADIUS_KM = 640
+
+# resolução da grade de células (0.1 grau ~ 11 km de latitude)
+GRID_CELLS_PER_DEGREE = 10
+
+# Célula inteira da grade que contém a coordenada
+def grid_cell(coord: float) -> int:
+    return math.floor(coord * GRID_CELLS_PER_DEGREE)
+
+# Distância entre duas coordenadas (haversine), em km
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    φ1, φ2 = math.radians(lat1), math.radians(lat2)
+    Δφ = φ2 - φ1
+    Δλ = math.radians(lon2) - math.radians(lon1)
+
+    a = math.sin(Δφ / 2)**2 + math.cos(φ1) * math.cos(φ2) * math.sin(Δλ / 2)**2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+# Versão vetorizada (NumPy) de haversine_km, com a mesma fórmula: distâncias em km de várias
+# coordenadas (lats, lons) até o ponto (lat, lon), numa só passada
+def haversine_km_batch(lat: float, lon: float, lats, lons) -> np.ndarray:
+    φ1, φ2 = np.radians(lat), np.radians(np.asarray(lats, dtype=np.float64))
+    Δφ = φ2 - φ1
+    Δλ = np.radians(np.asarray(lons, dtype=np.float64)) - np.radians(lon)
+
+    a = np.sin(Δφ / 2)**2 + np.cos(φ1) * np.cos(φ2) * np.sin(Δλ / 2)**2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+# Retângulo (min_lat, max_lat, min_lon, max_lon) que contém o círculo de raio radius_km
+def bounding_box(lat: float, lon: float, radius_km: float):
+    Δlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+
+    # perto dos polos o círculo cobre todas as longitudes
+    cos_lat = math.cos(math.radians(lat))
+    if abs(lat) + Δlat >= 90 or cos_lat <= 0:
+        return max(lat - Δlat, -90.0), min(lat + Δlat, 90.0), -180.0, 180.0
+
+    Δlon = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    return lat - Δlat, lat + Δlat, lon - Δlon, lon + Δlon
+
+# Distância (km) entre duas coordenadas no SQL: geo_distance(lat1, lon1, lat2, lon2).
+# Cada banco recebe a sua implementação (ver os @compiles abaixo), todas com o mesmo
+# haversine e raio de haversine_km.
+class geo_distance(GenericFunction):
+    type = Float()
+    inherit_cache = True
+
+# Padrão (PostgreSQL, SQL Server, ...): haversine com as funções matemáticas do SQL
+@compiles(geo_distance)
+def _compile_geo_distance(element, compiler, **kw):
+    lat1, lon1, lat2, lon2 = [func.radians(clause) for clause in element.clauses]
+    a = (
+        func.power(func.sin((lat2 - lat1) / 2.0), 2)
+        + func.cos(lat1) * func.cos(lat2) * func.power(func.sin((lon2 - lon1) / 2.0), 2)
+    )
+    return compiler.process(2 * EARTH_RADIUS_KM * func.asin(func.sqrt(a)), **kw)
+
+# MySQL: função espacial nativa (POINT recebe longitude, latitude)
+@compiles(geo_distance, "mysql")
+def _compile_geo_distance_mysql(element, compiler, **kw):
+    lat1, lon1, lat2, lon2 = element.clauses
+    distance = func.ST_Distance_Sphere(func.point(lon1, lat1), func.point(lon2, lat2), EARTH_RADIUS_KM * 1000)
+    return compiler.process(distance / 1000, **kw)
+
+# SQLite: a própria haversine_km, registrada como função do banco em cada conexão
+@compiles(geo_distance, "sqlite")
+def _compile_geo_distance_sqlite(element, compiler, **kw):
+    return "geo_distance(%s)" % compiler.process(element.clauses, **kw)
+
+def _sqlite_geo_distance(lat1, lon1, lat2, lon2):
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+    return haversine_km(lat1, lon1, lat2, lon2)
+
+# Registra as funções geográficas nas conexões SQLite do engine (nos outros bancos não faz nada)
+def register_geo_functions(engine):
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function("geo_distance", 4, _sqlite_geo_distance, deterministic=True)
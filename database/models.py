@@ -1,6 +1,8 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Float, Enum
+from sqlalchemy import Column, ForeignKey, Integer, String, Float, Boolean, Date, DateTime, Enum, Index, UniqueConstraint, event, false
 from sqlalchemy.orm import relationship
 from database.database import Base
+from database.geo import grid_cell
+from datetime import date
 import enum
 
 # Tabela Category
@@ -21,6 +23,15 @@ class Category(Base):
 # Tabela Offer
 class Offer(Base):
     __tablename__ = "offer"
+    __table_args__ = (
+        # ofertas válidas das filiais próximas; id_product e current_price no fim
+        # deixam o ranking de descontos ser respondido só pelo índice
+        Index("ix_offer_branch_expiration", "id_store_branch", "expiration", "id_product", "current_price"),
+        # menor preço por produto
+        Index("ix_offer_product_price", "id_product", "current_price"),
+        # uma oferta por produto em cada filial (chave da ingestão em lote)
+        UniqueConstraint("id_product", "id_store_branch", name="uq_offer_product_branch"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     id_product = Column(
@@ -43,7 +54,7 @@ class Offer(Base):
     )
     current_price = Column(Float, nullable=False)
     previous_price = Column(Float, nullable=True)
-    expiration = Column(String(10), nullable=False)
+    expiration = Column(Date, nullable=False, index=True)
 
     # Relacionamentos
     product = relationship(
@@ -55,11 +66,44 @@ class Offer(Base):
         back_populates="offers"
     )
 
-    def __init__(self, id_product: int, id_store_branch: int, current_value: float, previous_value: float = None):
+    def __init__(self, id_product: int, id_store_branch: int, current_price: float, previous_price: float = None, expiration: date = None):
         self.id_product = id_product
         self.id_store_branch = id_store_branch
-        self.current_value = current_value
-        self.previous_value = previous_value
+        self.current_price = current_price
+        self.previous_price = previous_price
+        self.expiration = expiration
+
+# Tabela OfferArchive: ofertas expiradas retiradas de offer por database.archive.
+# O id é do próprio arquivo; id_offer guarda o id que a oferta tinha em offer (um id
+# reaproveitado em offer pode aparecer mais de uma vez aqui)
+class OfferArchive(Base):
+    __tablename__ = "offer_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    id_offer = Column(Integer, nullable=False, index=True)
+    id_product = Column(
+        Integer,
+        ForeignKey(
+            "product.id",
+            onupdate="CASCADE",
+            ondelete="CASCADE"
+        ),
+        nullable=False,
+        index=True
+    )
+    id_store_branch = Column(
+        Integer,
+        ForeignKey(
+            "store_branch.id",
+            onupdate="CASCADE",
+            ondelete="CASCADE"
+        ),
+        nullable=False
+    )
+    current_price = Column(Float, nullable=False)
+    previous_price = Column(Float, nullable=True)
+    expiration = Column(Date, nullable=False)
+    archived_at = Column(DateTime, nullable=False)
 
 class MeasureType(enum.Enum):
     WEIGHT = "WEIGHT"
@@ -69,6 +113,9 @@ class MeasureType(enum.Enum):
 # Tabela Product
 class Product(Base):
     __tablename__ = "product"
+    __table_args__ = (
+        Index("ix_product_category", "id_category"),
+    )
 
     MEASURE_TYPES = (
         ("WEIGHT", "WEIGHT"),
@@ -110,6 +157,28 @@ class Product(Base):
         self.name = name
         self.description = description
 
+# Tabela ProductPriceStats: estatísticas de preço das ofertas válidas de cada produto,
+# mantidas por database.price_stats a cada gravação de ofertas
+class ProductPriceStats(Base):
+    __tablename__ = "product_price_stats"
+
+    id_product = Column(
+        Integer,
+        ForeignKey(
+            "product.id",
+            onupdate="CASCADE",
+            ondelete="CASCADE"
+        ),
+        primary_key=True
+    )
+    min_price = Column(Float, nullable=False)
+    avg_price = Column(Float, nullable=False)
+    offer_count = Column(Integer, nullable=False)
+    id_best_offer = Column(Integer, nullable=True)
+    discount_pct = Column(Float, nullable=False)
+    # expiração mais próxima entre as ofertas contadas (a partir dela o registro precisa ser recalculado)
+    valid_until = Column(Date, nullable=False, index=True)
+
 # Tabela Store
 class Store(Base):
     __tablename__ = "store"
@@ -131,6 +200,11 @@ class Store(Base):
 # Tabela StoreBranch
 class StoreBranch(Base):
     __tablename__ = "store_branch"
+    __table_args__ = (
+        Index("ix_store_branch_cell", "lat_cell", "lon_cell"),
+        # filiais de uma loja (listagem /store/{id}/products)
+        Index("ix_store_branch_store", "id_store"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     id_store = Column(
@@ -146,6 +220,10 @@ class StoreBranch(Base):
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
 
+    # Células da grade (database.geo.grid_cell) para o pré-filtro por retângulo
+    lat_cell = Column(Integer, nullable=False)
+    lon_cell = Column(Integer, nullable=False)
+
     # Relacionamentos
     store = relationship(
         "Store",
@@ -162,6 +240,17 @@ class StoreBranch(Base):
         self.description = description
         self.latitude = latitude
         self.longitude = longitude
+        self.update_cells()
+
+    def update_cells(self):
+        self.lat_cell = grid_cell(self.latitude)
+        self.lon_cell = grid_cell(self.longitude)
+
+# Recalcula as células sempre que a filial é gravada
+@event.listens_for(StoreBranch, "before_insert")
+@event.listens_for(StoreBranch, "before_update")
+def _update_store_branch_cells(mapper, connection, branch):
+    branch.update_cells()
 
 # Tabela User
 class User(Base):
@@ -171,6 +260,8 @@ class User(Base):
     name = Column(String(255), nullable=False)
     email = Column(String(255), nullable=False, unique=True)
     password = Column(String(255), nullable=False)
+    # permissão das rotas administrativas (ingestão de ofertas); concedida por database.admin
+    is_admin = Column(Boolean, nullable=False, default=False, server_default=false())
 
     def __init__(self, name: str, email: str, password: str):
         self.name = name
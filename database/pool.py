@@ -0,0 +1,50 @@
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from threading import Lock
+
+import time
+
+# Métricas acumuladas de aquisição de conexões (sobrevivem a pool.recreate())
+_metrics = {"checkouts": 0, "timeouts": 0, "wait_total": 0.0, "wait_max": 0.0}
+_metrics_lock = Lock()
+
+# Pool assíncrono que mede o tempo de espera para obter uma conexão
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with _metrics_lock:
+                _metrics["timeouts"] += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with _metrics_lock:
+                _metrics["checkouts"] += 1
+                _metrics["wait_total"] += wait
+                _metrics["wait_max"] = max(_metrics["wait_max"], wait)
+
+# Estado atual do pool (conexões em uso, overflow) e tempos de espera
+def get_pool_metrics(pool) -> dict:
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    checkouts = metrics.pop("checkouts")
+    wait_total = metrics.pop("wait_total")
+
+    current = {"pool": type(pool).__name__}
+    if hasattr(pool, "checkedout"):
+        current.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+    return {
+        **current,
+        "checkouts": checkouts,
+        "timeouts": metrics["timeouts"],
+        "wait_avg_ms": wait_total / checkouts * 1000 if checkouts else 0,
+        "wait_max_ms": metrics["wait_max"] * 1000,
+    }
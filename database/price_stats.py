@@ -0,0 +1,98 @@
+from database.models import Offer, ProductPriceStats
+from sqlalchemy import event, func, case, select, insert, delete, update, inspect
+from sqlalchemy.orm import Session
+from datetime import date
+
+# tamanho máximo da lista de ids por comando (limite de parâmetros dos bancos)
+CHUNK_SIZE = 500
+
+# Recalcula as estatísticas de preço (só ofertas válidas) dos produtos informados.
+# Sem product_ids recalcula a tabela inteira.
+def refresh_product_price_stats(connection, product_ids=None):
+    if product_ids is None:
+        _refresh(connection, None)
+        return
+
+    product_ids = sorted(set(product_ids))
+    for i in range(0, len(product_ids), CHUNK_SIZE):
+        _refresh(connection, product_ids[i:i + CHUNK_SIZE])
+
+def _refresh(connection, product_ids):
+    today = date.today()
+
+    avg_price = func.avg(Offer.current_price)
+    min_price = func.min(Offer.current_price)
+    aggregate = (
+        select(
+            Offer.id_product,
+            min_price,
+            avg_price,
+            func.count(Offer.id),
+            case((avg_price == 0, 0), else_=(avg_price - min_price) * 100 / avg_price),
+            func.min(Offer.expiration),
+        )
+        .where(Offer.expiration >= today)
+        .group_by(Offer.id_product)
+    )
+
+    stats = ProductPriceStats.__table__
+    clear = delete(stats)
+    best_offer = update(stats)
+    if product_ids is not None:
+        aggregate = aggregate.where(Offer.id_product.in_(product_ids))
+        clear = clear.where(stats.c.id_product.in_(product_ids))
+        best_offer = best_offer.where(stats.c.id_product.in_(product_ids))
+
+    connection.execute(clear)
+    connection.execute(
+        insert(stats).from_select(
+            ["id_product", "min_price", "avg_price", "offer_count", "discount_pct", "valid_until"],
+            aggregate
+        )
+    )
+
+    # oferta de menor preço (a de menor id em caso de empate)
+    connection.execute(
+        best_offer.values(
+            id_best_offer=(
+                select(func.min(Offer.id))
+                .where(
+                    Offer.id_product == stats.c.id_product,
+                    Offer.current_price == stats.c.min_price,
+                    Offer.expiration >= today
+                )
+                .scalar_subquery()
+            )
+        )
+    )
+
+# Recalcula os produtos cujas ofertas contadas já expiraram
+def refresh_expired_price_stats(connection):
+    product_ids = connection.execute(
+        select(ProductPriceStats.id_product)
+        .where(ProductPriceStats.valid_until < date.today())
+    ).scalars().all()
+    refresh_product_price_stats(connection, product_ids)
+    return len(product_ids)
+
+# Mantém as estatísticas atualizadas quando ofertas são inseridas, alteradas ou removidas
+@event.listens_for(Session, "after_flush")
+def _refresh_changed_offers(session, flush_context):
+    product_ids = set()
+    for offer in [*session.new, *session.dirty, *session.deleted]:
+        if not isinstance(offer, Offer):
+            continue
+        history = inspect(offer).attrs.id_product.history
+        product_ids.update(id for id in [*history.unchanged, *history.added, *history.deleted] if id is not None)
+
+    if product_ids:
+        refresh_product_price_stats(session.connection(), product_ids)
+
+# Reconstrói a tabela inteira
+# rodar no terminal: python -m database.price_stats
+if __name__ == "__main__":
+    from database.database import SessionLocal
+
+    with SessionLocal() as session:
+        refresh_product_price_stats(session.connection())
+        session.commit()
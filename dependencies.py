@@ -1,26 +1,67 @@
 from fastapi import Depends, HTTPException
-from database.database import engine
-from sqlalchemy.orm import sessionmaker
+from database.database import AsyncSessionLocal
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
 from database.models import User
-from main import SECRET_KEY, ALGORITHM, oauth2_schema
+from main import SECRET_KEY, ALGORITHM, PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_MAX_ENTRIES, oauth2_schema
+from cache import MemoryCacheBackend
 from jose import jwt, JWTError
 
-def get_session():
-    try:
-        Session = sessionmaker(bind=engine)
-        session = Session()
+# Usuários já verificados (id -> User desacoplado da sessão), com TTL curto
+principal_cache = MemoryCacheBackend(PRINCIPAL_CACHE_MAX_ENTRIES)
+
+async def get_session():
+    async with AsyncSessionLocal() as session:
         yield session
-    finally:
-        session.close()
 
-def verify_token(token: str = Depends(oauth2_schema), session = Depends(get_session)):
+def decode_token(token: str) -> int:
     try:
         dic_info = jwt.decode(token, SECRET_KEY, ALGORITHM)
-        id_user = int(dic_info.get("sub"))
-    except JWTError:
+        return int(dic_info.get("sub"))
+    except (JWTError, TypeError, ValueError):
         raise HTTPException(status_code=401, detail="Access denied")
-    
-    user = session.query(User).filter(User.id==id_user).first()
+
+async def verify_token(token: str = Depends(oauth2_schema), session: AsyncSession = Depends(get_session)):
+    id_user = decode_token(token)
+
+    user = principal_cache.get(id_user)
+    if user is not None:
+        return user
+
+    user = await session.get(User, id_user)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid access")
-    return user
\ No newline at end of file
+    principal_cache.set(id_user, user, PRINCIPAL_CACHE_TTL)
+    return user
+
+# Rotas administrativas: além do token válido, exige a permissão is_admin
+async def verify_admin(user: User = Depends(verify_token)):
+    if not user.is_admin:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    return user
+
+# Para rotas somente leitura: confia apenas nas claims assinadas do token, sem ir ao banco.
+# Retorna o id do usuário.
+def verify_token_claims(token: str = Depends(oauth2_schema)) -> int:
+    return decode_token(token)
+
+# Remove do cache os usuários removidos ou com senha ou permissão alteradas, após o commit
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, user):
+    attrs = inspect(user).attrs
+    if attrs.password.history.has_changes() or attrs.is_admin.history.has_changes():
+        object_session(user).info.setdefault("invalidated_users", set()).add(user.id)
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, user):
+    object_session(user).info.setdefault("invalidated_users", set()).add(user.id)
+
+@event.listens_for(Session, "after_commit")
+def _apply_user_invalidations(session):
+    for id_user in session.info.pop("invalidated_users", ()):
+        principal_cache.delete(id_user)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_invalidations(session):
+    session.info.pop("invalidated_users", None)
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+import asyncio
+
+# Executa o hash/verificação de senhas (bcrypt) num pool de threads dedicado,
+# fora do event loop. O bcrypt libera o GIL, então as threads rodam em paralelo.
+# Com todas as threads ocupadas e a fila cheia, responde 503 em vez de acumular requisições.
+class PasswordHasher:
+
+    def __init__(self, context, workers: int, queue_limit: int):
+        self.context = context
+        self.max_pending = workers + queue_limit
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.pending = 0  # em execução + na fila (só alterado no event loop)
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy, try again later",
+                headers={"Retry-After": "1"}
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(self.context.verify, password, hashed)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,238 @@
+from database.models import Offer, Product, StoreBranch
+from database.price_stats import refresh_product_price_stats
+from cache import invalidate_store_branches_on_commit
+from schemas import OfferIngestSchema
+from pydantic import ValidationError
+from sqlalchemy import select, insert, update, case
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+import csv
+import json
+import time
+
+INGEST_BATCH_SIZE = 5000
+# ids por consulta das ofertas existentes (limite de parâmetros dos bancos)
+LOOKUP_CHUNK_SIZE = 500
+# quantas linhas rejeitadas são detalhadas no relatório
+MAX_REPORTED_ERRORS = 100
+
+# Converte linhas de texto (CSV com cabeçalho ou NDJSON) em ofertas validadas
+class OfferRowParser:
+
+    def __init__(self, format: str):
+        if format not in ("csv", "ndjson"):
+            raise ValueError(f"Unsupported format: {format}")
+        self.format = format
+        self.header = None
+        self.line_number = 0
+
+    # Retorna (oferta, None), (None, erro) ou (None, None) para linhas ignoradas.
+    # Linhas em bytes são decodificadas como UTF-8 (uma linha inválida vira erro da linha).
+    def parse(self, line):
+        self.line_number += 1
+        try:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+        except UnicodeDecodeError as e:
+            return None, {"line": self.line_number, "error": str(e)}
+        line = line.strip()
+        if not line:
+            return None, None
+
+        try:
+            if self.format == "ndjson":
+                data = json.loads(line)
+            elif self.header is None:
+                self.header = next(csv.reader([line]))
+                return None, None
+            else:
+                data = dict(zip(self.header, next(csv.reader([line]))))
+            return OfferIngestSchema.model_validate(data), None
+        except (ValueError, ValidationError) as e:
+            return None, {"line": self.line_number, "error": str(e)}
+
+# Relatório da ingestão
+class IngestReport:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, error):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(error)
+
+    def as_dict(self):
+        seconds = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "rejected": self.rejected,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(self.rows / seconds) if seconds > 0 else 0,
+            "errors": self.errors,
+        }
+
+# Ids do modelo que existem no banco, consultados em blocos de LOOKUP_CHUNK_SIZE
+def _existing_ids(session: Session, model, ids) -> set:
+    ids = sorted(set(ids))
+    found = set()
+    for i in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+        found.update(session.scalars(select(model.id).where(model.id.in_(ids[i:i + LOOKUP_CHUNK_SIZE]))))
+    return found
+
+# Ofertas existentes das chaves (id_product, id_store_branch) do lote: {chave: (id, preço, validade)}
+def _existing_offers(session: Session, product_ids, store_branch_ids) -> dict:
+    existing = {}
+    for i in range(0, len(product_ids), LOOKUP_CHUNK_SIZE):
+        query = (
+            select(Offer.id, Offer.id_product, Offer.id_store_branch, Offer.current_price, Offer.expiration)
+            .where(Offer.id_product.in_(product_ids[i:i + LOOKUP_CHUNK_SIZE]))
+        )
+        # o filtro de filiais só entra se couber no limite de parâmetros
+        if len(store_branch_ids) <= LOOKUP_CHUNK_SIZE:
+            query = query.where(Offer.id_store_branch.in_(store_branch_ids))
+        for id, id_product, id_store_branch, current_price, expiration in session.execute(query):
+            existing[(id_product, id_store_branch)] = (id, current_price, expiration)
+    return existing
+
+# INSERT das ofertas novas. Outra ingestão pode ter criado a mesma chave depois da consulta
+# das existentes: nos bancos com upsert a linha vira um UPDATE (com o mesmo deslocamento do
+# preço para previous_price) em vez de violar uq_offer_product_branch e derrubar o lote.
+def _offer_insert(session: Session):
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        statement = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(Offer)
+        new = statement.excluded
+        return statement.on_conflict_do_update(
+            index_elements=[Offer.id_product, Offer.id_store_branch],
+            set_=_offer_upsert_values(new),
+        )
+    if dialect in ("mysql", "mariadb"):
+        statement = mysql_insert(Offer)
+        # o MySQL aplica as atribuições em ordem: previous_price antes de current_price
+        return statement.on_duplicate_key_update(list(_offer_upsert_values(statement.inserted).items()))
+    return insert(Offer)
+
+def _offer_upsert_values(new) -> dict:
+    return {
+        "previous_price": case(
+            (new.current_price != Offer.current_price, Offer.current_price),
+            else_=Offer.previous_price,
+        ),
+        "current_price": new.current_price,
+        "expiration": new.expiration,
+    }
+
+# Upsert de um lote de ofertas pela chave (id_product, id_store_branch), com comandos
+# executemany em vez de um INSERT/UPDATE do ORM por linha. Quando o preço muda, o preço
+# atual passa para previous_price. Linhas com produto ou filial inexistentes são rejeitadas
+# (antes de gravar, para não criar ofertas órfãs nem derrubar o lote nos bancos com FK).
+# Não faz commit.
+def upsert_offer_batch(session: Session, rows, report: IngestReport):
+    # a última linha de cada chave no lote prevalece
+    batch = {(row.id_product, row.id_store_branch): row for row in rows}
+    if not batch:
+        return
+
+    known_products = _existing_ids(session, Product, [id_product for id_product, _ in batch])
+    known_store_branches = _existing_ids(session, StoreBranch, [id_store_branch for _, id_store_branch in batch])
+    for id_product, id_store_branch in list(batch):
+        if id_product in known_products and id_store_branch in known_store_branches:
+            continue
+        del batch[(id_product, id_store_branch)]
+        report.reject({
+            "id_product": id_product,
+            "id_store_branch": id_store_branch,
+            "error": "Unknown product" if id_product not in known_products else "Unknown store branch",
+        })
+    if not batch:
+        return
+
+    product_ids = sorted({id_product for id_product, _ in batch})
+    store_branch_ids = sorted({id_store_branch for _, id_store_branch in batch})
+    existing = _existing_offers(session, product_ids, store_branch_ids)
+
+    inserts, updates = [], []
+    for key, row in batch.items():
+        if key not in existing:
+            inserts.append(row.model_dump())
+            continue
+
+        id, current_price, expiration = existing[key]
+        if row.current_price != current_price:
+            updates.append({
+                "id": id,
+                "previous_price": current_price,
+                "current_price": row.current_price,
+                "expiration": row.expiration,
+            })
+        elif row.expiration != expiration:
+            updates.append({"id": id, "expiration": row.expiration})
+        else:
+            report.unchanged += 1
+
+    # o UPDATE em lote pela chave primária exige o mesmo conjunto de colunas em cada grupo
+    for columns in ({"id", "expiration"}, {"id", "previous_price", "current_price", "expiration"}):
+        group = [values for values in updates if values.keys() == columns]
+        if group:
+            session.execute(update(Offer), group)
+    if inserts:
+        session.execute(_offer_insert(session), inserts)
+    report.inserted += len(inserts)
+    report.updated += len(updates)
+
+    # gravações em lote não passam pelos eventos do ORM: atualiza as estatísticas de
+    # preço e agenda a invalidação do cache de respostas manualmente
+    refresh_product_price_stats(session.connection(), product_ids)
+    invalidate_store_branches_on_commit(session, store_branch_ids)
+
+# Ingestão completa a partir de linhas de texto, com commit a cada lote
+def ingest_offers(session: Session, lines, format: str, batch_size: int = INGEST_BATCH_SIZE):
+    parser = OfferRowParser(format)
+    report = IngestReport()
+    rows = []
+
+    for line in lines:
+        row, error = parser.parse(line)
+        if error:
+            report.reject(error)
+        elif row:
+            report.rows += 1
+            rows.append(row)
+        if len(rows) >= batch_size:
+            upsert_offer_batch(session, rows, report)
+            session.commit()
+            rows = []
+
+    upsert_offer_batch(session, rows, report)
+    session.commit()
+    return report
+
+# rodar no terminal: python -m ingest ofertas.csv [--format ndjson] [--batch-size 5000]
+if __name__ == "__main__":
+    from database.database import SessionLocal
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk offer ingestion (CSV with header or NDJSON)")
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
+    format = args.format or ("ndjson" if args.file.endswith((".ndjson", ".jsonl")) else "csv")
+    with open(args.file, encoding="utf-8") as file, SessionLocal() as session:
+        report = ingest_offers(session, file, format, args.batch_size)
+    print(json.dumps(report.as_dict(), indent=2))
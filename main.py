@@ -1,25 +1,126 @@
 from fastapi import FastAPI
+from contextlib import asynccontextmanager
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from dotenv import load_dotenv
+from hashing import PasswordHasher
 
+import asyncio
+import logging
 import os
 
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+STORE_BRANCH_INDEX = os.getenv("STORE_BRANCH_INDEX", "true").lower() == "true"
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+BCRYPT_QUEUE_LIMIT = int(os.getenv("BCRYPT_QUEUE_LIMIT", "32"))
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))  # segundos
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+OFFER_ARCHIVE_INTERVAL = int(os.getenv("OFFER_ARCHIVE_INTERVAL", "0"))  # segundos, 0 desativa
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING", "false").lower() == "true"
+CATALOG_REFRESH_INTERVAL = int(os.getenv("CATALOG_REFRESH_INTERVAL", "300"))  # segundos, 0 desativa
+PRICE_STATS_REFRESH_INTERVAL = int(os.getenv("PRICE_STATS_REFRESH_INTERVAL", "600"))  # segundos, 0 desativa
+
+logger = logging.getLogger(__name__)
 
 bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(bcrypt_context, BCRYPT_WORKERS, BCRYPT_QUEUE_LIMIT)
 oauth2_schema = OAuth2PasswordBearer(tokenUrl="auth/login-form")
 
 from routes.app_routes import app_router
 from routes.auth_routes import auth_router
 from routes.product_routes import product_router
+from routes.metrics_routes import metrics_router
+from routes.offer_routes import offer_router
+from routes.store_routes import store_router
+from routes.geo_index import store_branch_index
+from routes.catalog import catalog_cache
+from database.database import AsyncSessionLocal, async_engine
+from database.price_stats import refresh_expired_price_stats
+from database.archive import archive_expired_offers
+from sqlalchemy.exc import SQLAlchemyError
+from profiling import ProfilingMiddleware, enable_sql_profiling
+
+# Arquiva as ofertas expiradas a cada `interval` segundos. Com vários processos (workers)
+# prefira desativar aqui e agendar o CLI (python -m database.archive) uma única vez.
+async def archive_offers_periodically(interval: int):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.run_sync(archive_expired_offers)
+        except SQLAlchemyError:
+            # falha no lote atual (registrada em /metrics/archive): o que já foi movido está
+            # salvo, tenta de novo no próximo ciclo
+            logger.exception("Offer archive failed")
+
+# Recarrega o catálogo (categorias, lojas, filiais) e o índice espacial das filiais a cada
+# `interval` segundos, para pegar mudanças feitas por outros processos
+async def refresh_catalog_periodically(interval: int):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as session:
+                if STORE_BRANCH_INDEX:
+                    await session.run_sync(store_branch_index.build)
+                await session.run_sync(catalog_cache.build)
+        except SQLAlchemyError:
+            # mantém o catálogo e o índice atuais e tenta de novo no próximo ciclo
+            logger.exception("Catalog refresh failed")
+
+# Recalcula a cada `interval` segundos as estatísticas de preço com ofertas que expiraram
+# (a listagem /product/best-offers também as recalcula na virada do dia: refresh_expired_price_stats_daily)
+async def refresh_price_stats_periodically(interval: int):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.run_sync(lambda sync_session: refresh_expired_price_stats(sync_session.connection()))
+                await session.commit()
+        except SQLAlchemyError:
+            # outro processo pode ter recalculado os mesmos produtos: tenta de novo no próximo ciclo
+            logger.exception("Price stats refresh failed")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # carrega o índice espacial das filiais na inicialização
+    async with AsyncSessionLocal() as session:
+        if STORE_BRANCH_INDEX:
+            await session.run_sync(store_branch_index.build)
+
+        # metadados de categorias, lojas e filiais usados pelas rotas
+        await session.run_sync(catalog_cache.build)
+
+        # recalcula as estatísticas de preço das ofertas que expiraram desde a última execução
+        await session.run_sync(lambda sync_session: refresh_expired_price_stats(sync_session.connection()))
+        await session.commit()
+
+    tasks = []
+    if OFFER_ARCHIVE_INTERVAL > 0:
+        tasks.append(asyncio.create_task(archive_offers_periodically(OFFER_ARCHIVE_INTERVAL)))
+    if CATALOG_REFRESH_INTERVAL > 0:
+        tasks.append(asyncio.create_task(refresh_catalog_periodically(CATALOG_REFRESH_INTERVAL)))
+    if PRICE_STATS_REFRESH_INTERVAL > 0:
+        tasks.append(asyncio.create_task(refresh_price_stats_periodically(PRICE_STATS_REFRESH_INTERVAL)))
+    yield
+    for task in tasks:
+        task.cancel()
+    password_hasher.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+
+# tempos por requisição (Server-Timing e /metrics); desativado não registra nada
+if REQUEST_PROFILING:
+    app.add_middleware(ProfilingMiddleware)
+    enable_sql_profiling(async_engine.sync_engine)
 
-app = FastAPI()
 app.include_router(app_router)
 app.include_router(auth_router)
 app.include_router(product_router)
+app.include_router(offer_router)
+app.include_router(store_router)
+app.include_router(metrics_router)
 
 # rodar no terminal: python -m uvicorn main:app --reload
\ No newline at end of file
@@ -0,0 +1,185 @@
+from sqlalchemy import event
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+import bisect
+import time
+
+# limites (segundos) dos buckets dos histogramas
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+# comandos mais lentos guardados para /metrics/sql
+MAX_SLOW_STATEMENTS = 10
+MAX_STATEMENT_LENGTH = 500
+
+# Perfil da requisição em andamento (None fora de uma requisição ou com o perfil desativado)
+_current_profile = ContextVar("request_profile", default=None)
+
+# Medições de uma requisição: tempo de banco, comandos SQL e etapas nomeadas (span)
+class RequestProfile:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.statements = 0
+        self.slowest = (0.0, None)  # (duração, sql)
+        self.spans = []  # [(nome, duração)]
+
+    def add_statement(self, duration: float, statement: str):
+        self.db_time += duration
+        self.statements += 1
+        if duration > self.slowest[0]:
+            self.slowest = (duration, statement)
+
+    # Cabeçalho Server-Timing (durações em ms)
+    def server_timing(self, total: float) -> str:
+        entries = [
+            f"total;dur={total * 1000:.1f}",
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.statements} queries"',
+        ]
+        if self.statements:
+            entries.append(f"db-slowest;dur={self.slowest[0] * 1000:.1f}")
+        entries += [f"{name};dur={duration * 1000:.1f}" for name, duration in self.spans]
+        return ", ".join(entries)
+
+# Mede uma etapa do processamento da requisição (aparece no Server-Timing).
+# Sem perfil ativo não mede nada.
+@contextmanager
+def span(name: str):
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.spans.append((name, time.perf_counter() - started))
+
+# Histograma cumulativo no formato do Prometheus
+class Histogram:
+
+    def __init__(self, name: str, help: str, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}  # labels -> [contagens por bucket, soma, total]
+        self._lock = Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self, label_names) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self.series.items()}
+
+        for labels, (counts, total, count) in sorted(series.items()):
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+REQUEST_LABELS = ("method", "route")
+request_duration = Histogram("http_request_duration_seconds", "Request wall time until the response starts", DURATION_BUCKETS)
+request_db_time = Histogram("http_request_db_seconds", "Time spent in SQL statements per request", DURATION_BUCKETS)
+request_statements = Histogram("http_request_sql_statements", "SQL statements executed per request", STATEMENT_BUCKETS)
+
+# comandos mais lentos desde a inicialização: [(duração, rota, sql)]
+_slow_statements = []
+_slow_statements_lock = Lock()
+
+def _record_slow_statement(duration: float, route: str, statement: str):
+    with _slow_statements_lock:
+        if len(_slow_statements) >= MAX_SLOW_STATEMENTS and duration <= _slow_statements[-1][0]:
+            return
+        bisect.insort(_slow_statements, (duration, route, statement), key=lambda entry: -entry[0])
+        del _slow_statements[MAX_SLOW_STATEMENTS:]
+
+def get_slow_statements() -> list:
+    with _slow_statements_lock:
+        return [
+            {"seconds": round(duration, 6), "route": route, "statement": statement}
+            for duration, route, statement in _slow_statements
+        ]
+
+# Texto de /metrics (formato de exposição do Prometheus)
+def render_metrics() -> str:
+    lines = []
+    for histogram in (request_duration, request_db_time, request_statements):
+        lines += histogram.render(REQUEST_LABELS)
+    return "\n".join(lines) + "\n"
+
+# Middleware ASGI: abre o perfil da requisição, adiciona o Server-Timing na resposta
+# e alimenta os histogramas
+class ProfilingMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        total = None
+
+        async def send_with_timing(message):
+            nonlocal total
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - profile.started
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"server-timing", profile.server_timing(total).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(token)
+            if total is None:
+                total = time.perf_counter() - profile.started
+
+            # rota pelo modelo do caminho (ex.: /product/{id}) para não criar uma série por id
+            route = getattr(scope.get("route"), "path", "unmatched")
+            labels = (scope["method"], route)
+            request_duration.observe(labels, total)
+            request_db_time.observe(labels, profile.db_time)
+            request_statements.observe(labels, profile.statements)
+            if profile.slowest[1] is not None:
+                _record_slow_statement(profile.slowest[0], route, profile.slowest[1])
+
+# Liga a medição dos comandos SQL do engine ao perfil da requisição em andamento
+def enable_sql_profiling(engine):
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_started"].pop()
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.add_statement(duration, statement[:MAX_STATEMENT_LENGTH])
+
+    # comando com erro não passa pelo after_cursor_execute
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
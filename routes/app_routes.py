@@ -1,46 +1,51 @@
 from fastapi import APIRouter, Query, Depends
 from dependencies import get_session
-from sqlalchemy.orm import Session
-from routes.product_routes import get_nearby_store_branches, get_store_branch_products, process_products
-from database.models import Store
+from cache import response_cache
+from sqlalchemy.ext.asyncio import AsyncSession
+from routes.product_routes import get_nearby_store_branches, get_store_branch_categories, process_products
+from routes.utils import get_nearest_stores, with_offer_distances
+from schemas import HomeSchema, CategorySchema
+from profiling import span
 
 app_router = APIRouter(prefix="/home", tags=["home"])
 
 # Rota de lista de produto
-@app_router.get("/")
+@app_router.get("/", response_model=HomeSchema)
 async def get_home(
     lat: float = Query(description="User latitude"),
     lon: float = Query(description="User longitude"),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    
-    # Obter as filiais próximas e produtos correspondentes
-    nearby_store_branches = get_nearby_store_branches(lat, lon, session)
-    store_branch_products = get_store_branch_products(nearby_store_branches, None, session)
-    
-    # Obtendo as categorias dos produtos das filiais
-    categories = set([p.category for p in store_branch_products])
 
-    # Processando produtos para a página inicial
-    products = process_products(store_branch_products, lat, lon, page=1, limit=5)
-    
-    # dicionário para armazenar a menor distância para cada loja
-    nearest_nearby_store_branches = {}
-    for branch, distance in nearby_store_branches:
-        store_id = branch.id_store     
-        if store_id not in nearest_nearby_store_branches:
-            nearest_nearby_store_branches[store_id] = (branch, distance)
+    # Obter as filiais próximas
+    with span("nearby"):
+        nearby_store_branches = await get_nearby_store_branches(lat, lon, session)
+
+    # Produtos e categorias em cache para o mesmo conjunto de filiais (distâncias recalculadas
+    # para o usuário); as lojas mais próximas dependem da posição exata e não entram no cache
+    cache_key = response_cache.key("home", lat, lon, [branch.id for branch, _ in nearby_store_branches])
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        products, categories = with_offer_distances(cached["products"], lat, lon), cached["categories"]
+    else:
+        # Obtendo as categorias dos produtos das filiais
+        with span("categories"):
+            categories = [
+                CategorySchema.model_validate(category)
+                for category in await get_store_branch_categories(nearby_store_branches, session)
+            ]
+
+        # Processando produtos para a página inicial
+        with span("products"):
+            products = await process_products(nearby_store_branches, None, lat, lon, page=1, limit=5, session=session)
+        response_cache.set(cache_key, {"products": products, "categories": categories})
+
+    # Lojas no raio, cada uma pela filial mais próxima
+    with span("stores"):
+        nearby_stores = await get_nearest_stores(lat, lon, session)
 
     return {
         "products": products,
         "categories" : categories,
-        "nearby_stores" : [
-            {
-                "id": sb.id_store,
-                "name": sb.store.name,
-                "distance": round(distance * 1000),  # Convertendo de km para metros
-                "logo" : sb.store.logo,
-            }
-            for sb, distance in nearest_nearby_store_branches.values()
-        ],
+        "nearby_stores" : nearby_stores,
     }
\ No newline at end of file
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from dependencies import get_session, verify_token
 from database.models import User
+from sqlalchemy import select
 from schemas import UserScheme, LoginSchema
-from main import bcrypt_context, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from main import password_hasher, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 from jose import jwt, JWTError
 from datetime import datetime, timedelta, timezone
 from fastapi.security import OAuth2PasswordRequestForm
@@ -15,29 +16,29 @@ def create_token(id_user, duration=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES
     token = jwt.encode(dict_info, SECRET_KEY, ALGORITHM)
     return token
 
-def authenticate_user(email, password, session):
-    user = session.query(User).filter(User.email==email).first()
+async def authenticate_user(email, password, session):
+    user = await session.scalar(select(User).where(User.email==email))
     if not user:
         return False
-    elif not bcrypt_context.verify(password, user.password):
+    elif not await password_hasher.verify(password, user.password):
         return False
     return user
 
 @auth_router.post("/register")
 async def register(user_scheme: UserScheme, session = Depends(get_session)):
-    user = session.query(User).filter(User.email == user_scheme.email).first()
+    user = await session.scalar(select(User).where(User.email == user_scheme.email))
     if user:
         raise HTTPException(status_code=400, detail="E-mail já cadastrado")
     else:
-        encrypted_password = bcrypt_context.hash(user_scheme.password)
+        encrypted_password = await password_hasher.hash(user_scheme.password)
         new_user = User(user_scheme.name, user_scheme.email, encrypted_password)
         session.add(new_user)
-        session.commit()
+        await session.commit()
         return { "success" : "User registered successfully" }
     
 @auth_router.post("/login")
 async def login(login_scheme: LoginSchema, session = Depends(get_session)):
-    user = authenticate_user(login_scheme.email, login_scheme.password, session)
+    user = await authenticate_user(login_scheme.email, login_scheme.password, session)
     if not user:
         raise HTTPException(status_code=400, detail="User not found or invalid password")
     else:
@@ -51,7 +52,7 @@ async def login(login_scheme: LoginSchema, session = Depends(get_session)):
 
 @auth_router.post("/login-form")
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), session = Depends(get_session)):
-    user = authenticate_user(form_data.username, form_data.password, session)
+    user = await authenticate_user(form_data.username, form_data.password, session)
     if not user:
         raise HTTPException(status_code=400, detail="User not found or invalid password")
     else:
@@ -0,0 +1,121 @@
+from database.models import Category, Store, StoreBranch
+from cache import response_cache
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+from collections import namedtuple
+from threading import RLock
+
+CatalogCategory = namedtuple("CatalogCategory", "id name url_icon")
+CatalogStore = namedtuple("CatalogStore", "id name logo")
+CatalogStoreBranch = namedtuple("CatalogStoreBranch", "id id_store description latitude longitude")
+
+# tabela -> (modelo, entrada do catálogo com as colunas lidas)
+CATALOG_TABLES = {
+    "category": (Category, CatalogCategory),
+    "store": (Store, CatalogStore),
+    "store_branch": (StoreBranch, CatalogStoreBranch),
+}
+
+# Cache em memória dos metadados de categorias, lojas e filiais (nome, logo, ícone, descrição).
+# Mudam poucas vezes por dia e são lidos em toda requisição: as rotas resolvem por id aqui
+# em vez de juntar as tabelas. Carregado na inicialização, atualizado pelos commits deste
+# processo e recarregado periodicamente (mudanças feitas por outros processos); ids ainda
+# desconhecidos são buscados no banco sob demanda (load_missing).
+class CatalogCache:
+
+    def __init__(self):
+        self._lock = RLock()
+        self._entries = {table: {} for table in CATALOG_TABLES}
+        self.version = 0
+        self.ready = False
+
+    def _query(self, table: str, ids=None):
+        model, entry = CATALOG_TABLES[table]
+        query = select(*[getattr(model, field) for field in entry._fields])
+        if ids is not None:
+            query = query.where(model.id.in_(ids))
+        return query
+
+    # Carrega as três tabelas (chamado na inicialização e no recarregamento periódico)
+    def build(self, session):
+        entries = {
+            table: {row.id: entry._make(row) for row in session.execute(self._query(table))}
+            for table, (_, entry) in CATALOG_TABLES.items()
+        }
+        with self._lock:
+            self._entries = entries
+            self.version += 1
+            self.ready = True
+
+    # Busca no banco os ids que ainda não estão no catálogo
+    async def load_missing(self, session, table: str, ids):
+        entries = self._entries[table]
+        missing = sorted({id for id in ids if id is not None and id not in entries})
+        if not missing:
+            return
+        rows = (await session.execute(self._query(table, missing))).all()
+        entry = CATALOG_TABLES[table][1]
+        with self._lock:
+            for row in rows:
+                self._entries[table][row.id] = entry._make(row)
+
+    def get(self, table: str, id: int):
+        return self._entries[table].get(id)
+
+    # Entradas dos ids informados, na mesma ordem (ids desconhecidos são ignorados)
+    def many(self, table: str, ids):
+        entries = self._entries[table]
+        return [entries[id] for id in ids if id in entries]
+
+    def upsert(self, table: str, entry):
+        with self._lock:
+            self._entries[table][entry.id] = entry
+            self.version += 1
+
+    def remove(self, table: str, id: int):
+        with self._lock:
+            self._entries[table].pop(id, None)
+            self.version += 1
+
+catalog_cache = CatalogCache()
+
+# Mudanças: acumuladas na sessão e aplicadas após o commit (descartadas no rollback).
+# As respostas em cache também trazem nomes e logos, então são invalidadas junto.
+def _pending_changes(target):
+    return object_session(target).info.setdefault("catalog_changes", [])
+
+def _catalog_entry(target):
+    table = target.__tablename__
+    entry = CATALOG_TABLES[table][1]
+    return table, entry._make(getattr(target, field) for field in entry._fields)
+
+@event.listens_for(Category, "after_insert")
+@event.listens_for(Category, "after_update")
+@event.listens_for(Store, "after_insert")
+@event.listens_for(Store, "after_update")
+@event.listens_for(StoreBranch, "after_insert")
+@event.listens_for(StoreBranch, "after_update")
+def _catalog_upsert(mapper, connection, target):
+    _pending_changes(target).append(("upsert", *_catalog_entry(target)))
+
+@event.listens_for(Category, "after_delete")
+@event.listens_for(Store, "after_delete")
+@event.listens_for(StoreBranch, "after_delete")
+def _catalog_remove(mapper, connection, target):
+    _pending_changes(target).append(("remove", target.__tablename__, target.id))
+
+@event.listens_for(Session, "after_commit")
+def _apply_catalog_changes(session):
+    changes = session.info.pop("catalog_changes", None)
+    if not changes:
+        return
+    for action, table, value in changes:
+        if action == "upsert":
+            catalog_cache.upsert(table, value)
+        else:
+            catalog_cache.remove(table, value)
+    response_cache.invalidate_all()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session):
+    session.info.pop("catalog_changes", None)
@@ -0,0 +1,109 @@
+from database.models import StoreBranch
+from database.geo import haversine_km, bounding_box, grid_cell
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from threading import RLock
+
+# Índice espacial em memória das filiais (grade de células lat/lon).
+# Evita varrer a tabela store_branch inteira a cada requisição: a busca
+# olha só as células que cobrem o retângulo do raio e depois refina com haversine.
+class StoreBranchIndex:
+
+    def __init__(self):
+        self._lock = RLock()
+        self._cells = {}      # (i_lat, i_lon) -> {id_branch: (lat, lon)}
+        self._branches = {}   # id_branch -> (i_lat, i_lon)
+        self.ready = False
+
+    def _cell(self, lat: float, lon: float):
+        return grid_cell(lat), grid_cell(lon)
+
+    # Carrega todas as filiais do banco (na inicialização e no recarregamento periódico, que
+    # pega as mudanças feitas por outros processos). O índice novo é montado fora da trava
+    # e substitui o anterior de uma vez.
+    def build(self, session):
+        rows = session.query(StoreBranch.id, StoreBranch.latitude, StoreBranch.longitude).all()
+        cells, branches = {}, {}
+        for id_branch, lat, lon in rows:
+            cell = self._cell(lat, lon)
+            cells.setdefault(cell, {})[id_branch] = (lat, lon)
+            branches[id_branch] = cell
+        with self._lock:
+            self._cells = cells
+            self._branches = branches
+            self.ready = True
+
+    def upsert(self, id_branch: int, lat: float, lon: float):
+        with self._lock:
+            self.remove(id_branch)
+            cell = self._cell(lat, lon)
+            self._cells.setdefault(cell, {})[id_branch] = (lat, lon)
+            self._branches[id_branch] = cell
+
+    def remove(self, id_branch: int):
+        with self._lock:
+            cell = self._branches.pop(id_branch, None)
+            if cell is None:
+                return
+            branches = self._cells[cell]
+            branches.pop(id_branch, None)
+            if not branches:
+                del self._cells[cell]
+
+    def location(self, id_branch: int):
+        with self._lock:
+            cell = self._branches.get(id_branch)
+            return None if cell is None else self._cells[cell][id_branch]
+
+    # Retorna [(id_branch, distância_km)] dentro do raio, ordenado pela distância
+    def nearby(self, lat: float, lon: float, radius_km: float):
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        i_lat_min, i_lon_min = self._cell(min_lat, min_lon)
+        i_lat_max, i_lon_max = self._cell(max_lat, max_lon)
+
+        result = []
+        with self._lock:
+            for i_lat in range(i_lat_min, i_lat_max + 1):
+                for i_lon in range(i_lon_min, i_lon_max + 1):
+                    for id_branch, (b_lat, b_lon) in self._cells.get((i_lat, i_lon), {}).items():
+                        # pré-filtro pelo retângulo antes do cálculo exato
+                        if not (min_lat <= b_lat <= max_lat and min_lon <= b_lon <= max_lon):
+                            continue
+                        distance = haversine_km(lat, lon, b_lat, b_lon)
+                        if distance <= radius_km:
+                            result.append((id_branch, distance))
+
+        result.sort(key=lambda r: (r[1], r[0]))
+        return result
+
+store_branch_index = StoreBranchIndex()
+
+# Mantém o índice atualizado quando filiais são inseridas, alteradas ou removidas por este
+# processo: as mudanças são acumuladas na sessão e aplicadas após o commit (descartadas no
+# rollback), como no catálogo (routes.catalog)
+def _pending_changes(branch):
+    return object_session(branch).info.setdefault("store_branch_index_changes", [])
+
+@event.listens_for(StoreBranch, "after_insert")
+@event.listens_for(StoreBranch, "after_update")
+def _index_store_branch(mapper, connection, branch):
+    _pending_changes(branch).append((branch.id, branch.latitude, branch.longitude))
+
+@event.listens_for(StoreBranch, "after_delete")
+def _unindex_store_branch(mapper, connection, branch):
+    _pending_changes(branch).append((branch.id, None, None))
+
+@event.listens_for(Session, "after_commit")
+def _apply_index_changes(session):
+    changes = session.info.pop("store_branch_index_changes", None)
+    if not changes or not store_branch_index.ready:
+        return
+    for id_branch, lat, lon in changes:
+        if lat is None:
+            store_branch_index.remove(id_branch)
+        else:
+            store_branch_index.upsert(id_branch, lat, lon)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_index_changes(session):
+    session.info.pop("store_branch_index_changes", None)
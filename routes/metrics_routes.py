@@ -0,0 +1,35 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from cache import response_cache
+from database.database import async_engine
+from database.pool import get_pool_metrics
+from database import archive
+from profiling import render_metrics, get_slow_statements
+
+metrics_router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+# Histogramas por rota (tempo total, tempo de banco, comandos SQL) no formato do Prometheus.
+# Vazio com REQUEST_PROFILING desativado.
+@metrics_router.get("", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Comandos SQL mais lentos registrados pelo perfil das requisições
+@metrics_router.get("/sql")
+async def get_sql_metrics():
+    return get_slow_statements()
+
+# Contadores do cache de respostas (acertos, falhas, entradas)
+@metrics_router.get("/cache")
+async def get_cache_metrics():
+    return response_cache.stats()
+
+# Estado do pool de conexões do banco (em uso, overflow, tempo de espera)
+@metrics_router.get("/pool")
+async def get_pool_metrics_route():
+    return get_pool_metrics(async_engine.pool)
+
+# Última execução do arquivamento de ofertas expiradas (linhas movidas, duração)
+@metrics_router.get("/archive")
+async def get_archive_metrics():
+    return archive.last_report
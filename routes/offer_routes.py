@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, Query, Request
+from dependencies import get_session, verify_admin
+from sqlalchemy.ext.asyncio import AsyncSession
+from ingest import OfferRowParser, IngestReport, upsert_offer_batch, INGEST_BATCH_SIZE
+
+offer_router = APIRouter(prefix="/offer", tags=["offers"])
+
+# Lê o corpo da requisição linha a linha, sem carregá-lo inteiro na memória. As linhas saem
+# em bytes: o parser decodifica e rejeita as que não são UTF-8 válido.
+async def read_lines(request: Request):
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+# Ingestão em lote de ofertas: corpo em CSV (com cabeçalho) ou NDJSON. Só para administradores
+# (python -m database.admin): qualquer um pode criar uma conta em /auth/register
+@offer_router.post("/ingest")
+async def ingest_offers(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$", description="Body format: csv or ndjson"),
+    batch_size: int = Query(INGEST_BATCH_SIZE, gt=0, description="Rows per upsert batch"),
+    session: AsyncSession = Depends(get_session),
+    user = Depends(verify_admin)
+):
+    parser = OfferRowParser(format)
+    report = IngestReport()
+    rows = []
+
+    async for line in read_lines(request):
+        row, error = parser.parse(line)
+        if error:
+            report.reject(error)
+        elif row:
+            report.rows += 1
+            rows.append(row)
+        if len(rows) >= batch_size:
+            await session.run_sync(upsert_offer_batch, rows, report)
+            await session.commit()
+            rows = []
+
+    await session.run_sync(upsert_offer_batch, rows, report)
+    await session.commit()
+    return report.as_dict()
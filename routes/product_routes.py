@@ -1,56 +1,110 @@
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from dependencies import get_session
-from database.models import Product
-from sqlalchemy.orm import Session, contains_eager
-from sqlalchemy import func
-from routes.utils import haversine, serialize_product, get_nearby_store_branches, get_store_branch_products, process_products
-from datetime import date, datetime
+from database.database import AsyncSessionLocal
+from cache import response_cache
+from schemas import ProductSchema, ProductPageSchema, ProductBatchRequestSchema, ProductBatchSchema
+from database.models import Product, Offer
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, and_
+from sqlalchemy.orm import contains_eager
+from routes.utils import serialize_product, get_product_filters, get_product_load_plan, get_nearby_store_branches, get_store_branch_categories, process_products, stream_store_branch_products, get_products_batch, get_store_baskets, list_all_products, with_offer_distances
+from typing import Optional, Union
 
 product_router = APIRouter(prefix="/product", tags=["products"])
 
-@product_router.get("/")
+@product_router.get("/", response_model=Union[list[ProductSchema], ProductPageSchema])
 async def get_products(
     id_category: int = Query(None, description="Filter by category ID"),
     lat: float = Query(description="User latitude"),
     lon: float = Query(description="User longitude"),
-    page: int = Query(1, description="Number of products page"),
-    limit: int = Query(5, description="Limit of products per page"),
-    session: Session = Depends(get_session)
+    page: int = Query(1, gt=0, description="Number of products page"),
+    limit: int = Query(5, gt=0, description="Limit of products per page"),
+    cursor: str = Query(None, description="Cursor pagination: next_cursor of the previous page (empty for the first page)"),
+    session: AsyncSession = Depends(get_session)
 ):
-    
-    # Obtendo as filiais próximas e produtos correspondentes
-    nearby_store_branches = get_nearby_store_branches(lat, lon, session)
-    store_branch_products = get_store_branch_products(nearby_store_branches, id_category, session)
 
-    return process_products(store_branch_products, lat, lon, page, limit)
+    # Filiais no raio da posição do usuário; a resposta em cache é a do mesmo conjunto de
+    # filiais, categoria e página, com as distâncias recalculadas para o usuário
+    nearby_store_branches = await get_nearby_store_branches(lat, lon, session)
+    cache_key = response_cache.key(
+        "products", lat, lon, [branch.id for branch, _ in nearby_store_branches], id_category, page, limit, cursor
+    )
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        if isinstance(cached, list):
+            return with_offer_distances(cached, lat, lon)
+        return {**cached, "products": with_offer_distances(cached["products"], lat, lon)}
 
-@product_router.get("/{id}")
+    # Página de produtos correspondentes às filiais próximas
+    response = await process_products(nearby_store_branches, id_category, lat, lon, page, limit, session, cursor)
+    response_cache.set(cache_key, response)
+    return response
+
+# Exportação completa (NDJSON, um produto por linha) das ofertas válidas nas filiais próximas,
+# para integrações. A resposta é gerada aos poucos, com memória constante.
+@product_router.get("/export")
+async def export_products(
+    id_category: int = Query(None, description="Filter by category ID"),
+    lat: float = Query(description="User latitude"),
+    lon: float = Query(description="User longitude"),
+):
+    return StreamingResponse(export_lines(id_category, lat, lon), media_type="application/x-ndjson")
+
+# A sessão é aberta dentro do gerador: a de Depends(get_session) já estaria fechada
+# enquanto a resposta é transmitida
+async def export_lines(id_category, lat, lon):
+    async with AsyncSessionLocal() as session:
+        nearby_store_branches = await get_nearby_store_branches(lat, lon, session)
+        if not nearby_store_branches:
+            return
+
+        async for products in stream_store_branch_products(nearby_store_branches, id_category, lat, lon, session):
+            if products:
+                yield b"".join(ProductSchema.model_validate(product).model_dump_json().encode() + b"\n" for product in products)
+
+# Menor preço de cada produto entre todas as ofertas válidas, lido de product_price_stats,
+# das ofertas mais próximas do usuário para as mais distantes
+@product_router.get("/best-offers", response_model=Union[list[ProductSchema], ProductPageSchema])
+async def get_best_offers(
+    lat: float = Query(description="User latitude"),
+    lon: float = Query(description="User longitude"),
+    page: int = Query(1, gt=0, description="Number of products page"),
+    limit: int = Query(5, gt=0, description="Limit of products per page"),
+    cursor: str = Query(None, description="Cursor pagination: next_cursor of the previous page (empty for the first page)"),
+    session: AsyncSession = Depends(get_session)
+):
+    return await list_all_products(limit, (page - 1) * limit, lat, lon, session, cursor)
+
+# Vários produtos de uma vez (tela da lista de compras): o mesmo conteúdo de GET /product/{id}
+# para cada id, com um número fixo de consultas, e o total da lista em cada loja
+@product_router.post("/batch", response_model=ProductBatchSchema)
+async def get_products_by_ids(
+    body: ProductBatchRequestSchema,
+    session: AsyncSession = Depends(get_session)
+):
+    nearby_store_branches = await get_nearby_store_branches(body.lat, body.lon, session)
+    products = await get_products_batch(body.ids, nearby_store_branches, body.lat, body.lon, session)
+    return {"products": products, "baskets": get_store_baskets(products)}
+
+@product_router.get("/{id}", response_model=Optional[ProductSchema])
 async def get_product(
     id: int,
     lat: float = Query(description="User latitude"),
     lon: float = Query(description="User longitude"),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    # pega o produto com todas as ofertas
-    product = session.query(Product).filter(Product.id == id).first()
+    # pega o produto só com as ofertas válidas (não expiradas) das filiais próximas,
+    # filtradas no próprio join
+    nearby_store_branches = await get_nearby_store_branches(lat, lon, session)
+    product = (await session.scalars(
+        select(Product)
+            .outerjoin(Offer, and_(Offer.id_product == Product.id, *get_product_filters(nearby_store_branches, None)))
+            .where(Product.id == id)
+            .order_by(Offer.id)
+            .options(*get_product_load_plan(contains_eager(Product.offers)))
+    )).unique().first()
     if not product:
         return None
 
-    today = date.today()
-    valid_offers = []
-    for offer in product.offers:
-        # 1) filtra expiração
-        exp_date = datetime.strptime(offer.expiration, "%Y-%m-%d").date()
-        if exp_date < today:
-            continue
-
-        # 2) calcula distância ao store_branch da oferta
-        sb = offer.store_branch  # assumindo relacionamento backref
-        dist = haversine(lat, lon, sb.latitude, sb.longitude)
-        if dist <= 10000:
-            valid_offers.append(offer)
-
-    # sobrescreve a lista de offers
-    product.offers = valid_offers
-
-    return serialize_product(product, lat, lon)
\ No newline at end of file
+    return serialize_product(product, lat, lon)
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Query, Depends
+from dependencies import get_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from routes.utils import get_nearest_stores, list_products_by_store
+from schemas import NearestStoreSchema, ProductSchema, ProductPageSchema
+from typing import Union
+
+store_router = APIRouter(prefix="/store", tags=["stores"])
+
+# Lojas mais próximas do usuário (a filial mais próxima de cada loja)
+@store_router.get("/nearby", response_model=list[NearestStoreSchema])
+async def get_nearby_stores(
+    lat: float = Query(description="User latitude"),
+    lon: float = Query(description="User longitude"),
+    limit: int = Query(None, gt=0, le=100, description="Nearest k stores; widens the search radius when fewer are nearby"),
+    session: AsyncSession = Depends(get_session)
+):
+    return await get_nearest_stores(lat, lon, session, limit)
+
+# Produtos de uma loja, cada um pela oferta válida de menor preço da loja, da filial mais próxima
+@store_router.get("/{id}/products", response_model=Union[list[ProductSchema], ProductPageSchema])
+async def get_store_products(
+    id: int,
+    lat: float = Query(description="User latitude"),
+    lon: float = Query(description="User longitude"),
+    page: int = Query(1, gt=0, description="Number of products page"),
+    limit: int = Query(5, gt=0, description="Limit of products per page"),
+    cursor: str = Query(None, description="Cursor pagination: next_cursor of the previous page (empty for the first page)"),
+    session: AsyncSession = Depends(get_session)
+):
+    return await list_products_by_store(id, limit, (page - 1) * limit, lat, lon, session, cursor)
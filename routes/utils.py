@@ -1,239 +1,514 @@
-from database.models import Product, Offer, StoreBranch, StoreBranch
-from sqlalchemy import func
-from sqlalchemy.orm import aliased, Session, contains_eager
+from database.models import Product, Offer, StoreBranch, ProductPriceStats
+from database.geo import NEARBY_RADIUS_KM, NEAREST_STORES_MAX_RADIUS_KM, bounding_box, grid_cell, geo_distance, haversine_km, haversine_km_batch
+from database.price_stats import refresh_expired_price_stats
+from routes.geo_index import store_branch_index
+from routes.catalog import catalog_cache, CatalogStoreBranch
+from fastapi import HTTPException
+from sqlalchemy import func, case, or_, and_, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, selectinload
 from datetime import date
 
+import asyncio
+import base64
+import json
 import math
-
-def list_all_products(page_size, offset, lat, lon, session):
-    # 1) Subquery: para cada produto, qual é o menor preço?
-    min_price_sq = (
-        session.query(
-            Offer.id_product.label("pid"),
-            func.min(Offer.current_price).label("min_price")
-        )
-        .group_by(Offer.id_product)
-        .subquery()
-    )
-
-    # 2) Faça o join de Offer com essa subquery, garantindo que
-    #    Offer.current_price == subquery.min_price
-    #    Depois junte com StoreBranch e calcule a distância.
+import numpy as np
+
+# linhas (produto, oferta) buscadas do banco por vez na exportação
+EXPORT_YIELD_PER = 1000
+
+# dia em que este processo recalculou pela última vez as estatísticas de preço vencidas
+_price_stats_refreshed_on = None
+_price_stats_lock = asyncio.Lock()
+
+# Plano de carregamento do que serialize_products lê do banco: Product -> Offer.
+# As ofertas dos produtos da página vêm num único SELECT ... IN (selectinload), ou do próprio
+# join quando a query já filtra as ofertas (contains_eager). Filial e loja vêm do catálogo
+# em memória (routes.catalog), sem join. Nenhum lazy load é disparado na serialização.
+def get_product_load_plan(offers_loader=None):
+    if offers_loader is None:
+        offers_loader = selectinload(Product.offers)
+    return (offers_loader,)
+
+# Garante no catálogo as filiais e lojas das ofertas que serão serializadas
+async def load_offers_catalog(offers, session: AsyncSession):
+    await catalog_cache.load_missing(session, "store_branch", {o.id_store_branch for o in offers})
+    await catalog_cache.load_missing(session, "store", {
+        branch.id_store for branch in catalog_cache.many("store_branch", {o.id_store_branch for o in offers})
+    })
+
+# Na virada do dia as estatísticas com ofertas que acabaram de vencer deixariam seus produtos
+# fora da listagem até o recálculo periódico (para sempre com PRICE_STATS_REFRESH_INTERVAL=0):
+# a primeira listagem do dia neste processo recalcula as vencidas. Se falhar (ex.: outro
+# processo recalculando os mesmos produtos), a listagem segue e a próxima tenta de novo.
+async def refresh_expired_price_stats_daily(session: AsyncSession):
+    global _price_stats_refreshed_on
+    if _price_stats_refreshed_on == date.today():
+        return
+
+    async with _price_stats_lock:
+        today = date.today()
+        if _price_stats_refreshed_on == today:
+            return
+        try:
+            await session.run_sync(lambda sync_session: refresh_expired_price_stats(sync_session.connection()))
+            await session.commit()
+        except SQLAlchemyError:
+            await session.rollback()
+            return
+        _price_stats_refreshed_on = today
+
+async def list_all_products(page_size, offset, lat, lon, session: AsyncSession, cursor=None):
+    await refresh_expired_price_stats_daily(session)
+
+    # 1) O menor preço de cada produto vem de product_price_stats (id_best_offer).
+    #    Junte a oferta de menor preço com StoreBranch e calcule a distância.
+    #    Estatísticas com alguma oferta contada já expirada (valid_until) são recalculadas
+    #    na primeira listagem do dia (refresh_expired_price_stats_daily).
     distance_expr = get_distance_expression(
         lat, lon,
         StoreBranch.latitude, StoreBranch.longitude,
     )
 
-    results = (
-        session.query(
+    query = (
+        select(
             Offer.id_product,
-            Offer.id_store_branch
-        )
-        # join no subquery de preços mínimos
-        .join(min_price_sq, 
-            (Offer.id_product == min_price_sq.c.pid) &
-            (Offer.current_price == min_price_sq.c.min_price)
+            Offer.id_store_branch,
+            distance_expr
         )
+        # join na oferta de menor preço de cada produto
+        .join(ProductPriceStats, Offer.id == ProductPriceStats.id_best_offer)
         # join na tabela de filiais
         .join(StoreBranch, Offer.id_store_branch == StoreBranch.id)
-        .order_by(distance_expr)
-        .limit(page_size)
-        .offset(offset)
-        .all()
+        .where(ProductPriceStats.valid_until >= date.today())
+        .order_by(distance_expr, Offer.id_product)
     )
 
+    # 2) paginação por cursor (continua depois da chave (distância, id)) ou por offset
+    if cursor is not None:
+        query = query.where(*get_keyset_filter(cursor, distance_expr.element, Offer.id_product))
+    else:
+        query = query.offset(offset)
+    results = (await session.execute(query.limit(page_size))).all()
+
     if not results:
-        return []
+        return [] if cursor is None else {"products": [], "next_cursor": None}
+
+    # 3) lista de produtos a ser mostrada ao usuário
+    product_ids = [prod_id for prod_id, _, _ in results]
+    products = sort_by_ids((await session.scalars(
+        select(Product)
+            .where(Product.id.in_(product_ids))
+            .options(*get_product_load_plan(selectinload(Product.offers.and_(Offer.expiration >= date.today()))))
+    )).all(), product_ids)
+
+    await load_offers_catalog([o for p in products for o in p.offers], session)
+    products = serialize_products(products, lat, lon)
+    if cursor is None:
+        return products
+
+    last_id, _, last_distance = results[-1]
+    return {
+        "products": products,
+        "next_cursor": encode_cursor(last_distance, last_id) if len(results) == page_size else None,
+    }
+
+# Ranking dos produtos de uma loja: uma linha por produto, com a oferta válida de menor preço
+# da loja (empate: filial mais próxima) e sua distância em metros, da mais próxima.
+# O menor preço de cada produto na loja é calculado uma única vez (CTE agrupada) e juntado às
+# ofertas, em vez de uma subquery correlacionada reavaliada para cada oferta; a distância só é
+# calculada para as ofertas no menor preço. As duas etapas partem das filiais da loja
+# (ix_store_branch_store) e chegam às ofertas válidas pelo ix_offer_branch_expiration, sem
+# percorrer as ofertas das outras lojas.
+def get_store_products_query(id_store, lat, lon):
+    store_offer_filters = [StoreBranch.id_store == id_store, Offer.expiration >= date.today()]
+
+    min_prices = (
+        select(Offer.id_product, func.min(Offer.current_price).label("min_price"))
+            .select_from(StoreBranch)
+            .join(Offer, Offer.id_store_branch == StoreBranch.id)
+            .where(*store_offer_filters)
+            .group_by(Offer.id_product)
+            .cte("store_min_prices")
+    )
 
-    # 4) lista de produtos a ser mostrada ao usuário
-    product_ids = [prod_id for prod_id, _ in results]
-    products = (
-        session
-            .query(Product)
-            .filter(Product.id.in_(product_ids))
-            .order_by(func.field(Product.id, *product_ids))
-            .all()
-        )
-    
-    return [serialize_product(product, lat, lon) for product in products]
-
-def list_products_by_store(id_store, page_size, offset, lat, lon, session):
-    SB2 = aliased(StoreBranch)
-    O2 = aliased(Offer)
-    P = aliased(Product)
-    SB3 = aliased(StoreBranch)
-    O3 = aliased(Offer)
-
-    # Subquery para obter o menor preço por produto na mesma loja (id_store)
-    subq = (
-        session.query(func.min(O3.current_price))
-        .join(SB3, SB3.id == O3.id_store_branch)
-        .filter(
-            O3.id_product == O2.id_product,
-            SB3.id_store == id_store
+    distance_expr = get_distance_expression(lat, lon, StoreBranch.latitude, StoreBranch.longitude)
+    best_offers = (
+        select(
+            Offer.id_product,
+            distance_expr,
+            func.row_number().over(
+                partition_by=Offer.id_product,
+                order_by=(distance_expr.element, Offer.id),
+            ).label("position"),
         )
-        .scalar_subquery()
+        .select_from(StoreBranch)
+        .join(Offer, Offer.id_store_branch == StoreBranch.id)
+        .join(min_prices, and_(
+            min_prices.c.id_product == Offer.id_product,
+            min_prices.c.min_price == Offer.current_price,
+        ))
+        .where(*store_offer_filters)
+        .cte("store_best_offers")
     )
 
-    # Cálculo da distância em metros pelo Haversine
-    distance_expr = get_distance_expression(lat, lon, SB2.latitude, SB2.longitude)
-
-    # Query principal: inicia a partir de SB2 para evitar aliases duplicados
-    results = (
-        session.query(P.id)
-        .select_from(SB2)
-        .join(O2, O2.id_store_branch == SB2.id)
-        .join(P, P.id == O2.id_product)
-        .filter(O2.current_price == subq)
-        .order_by(distance_expr)
-        .limit(page_size)
-        .offset(offset)
-        .all()
+    return (
+        select(best_offers.c.id_product, best_offers.c.distance)
+            .where(best_offers.c.position == 1)
+            .order_by(best_offers.c.distance, best_offers.c.id_product)
     )
 
+async def list_products_by_store(id_store, page_size, offset, lat, lon, session: AsyncSession, cursor=None):
+    query = get_store_products_query(id_store, lat, lon)
+    id_product, distance = query.selected_columns
+
+    # Paginação por cursor (continua depois da chave (distância, id)) ou por offset
+    if cursor is not None:
+        query = query.where(*get_keyset_filter(cursor, distance, id_product))
+    else:
+        query = query.offset(offset)
+    results = (await session.execute(query.limit(page_size))).all()
+
     if not results:
-        return []
+        return [] if cursor is None else {"products": [], "next_cursor": None}
 
-    # Extrai IDs (cada resultado é tupla: (id,))
+    # Extrai IDs (cada resultado é tupla: (id, distância))
     product_ids = [r[0] for r in results]
 
-    # Busca objetos Product e preserva a ordem original usando FIELD (MySQL)
-    products = (
-        session
-        .query(Product)
-        .filter(Product.id.in_(product_ids))
-        .order_by(func.field(Product.id, *product_ids))
-        .all()
-    )
+    # Busca objetos Product e preserva a ordem do ranking, só com as ofertas válidas das
+    # filiais da loja (as mesmas que entram no ranking)
+    store_branch_ids = select(StoreBranch.id).where(StoreBranch.id_store == id_store)
+    products = sort_by_ids((await session.scalars(
+        select(Product)
+        .where(Product.id.in_(product_ids))
+        .options(*get_product_load_plan(selectinload(Product.offers.and_(
+            Offer.expiration >= date.today(),
+            Offer.id_store_branch.in_(store_branch_ids),
+        ))))
+    )).all(), product_ids)
 
     # Serializa e retorna
-    return [serialize_product(product, lat, lon) for product in products]
+    await load_offers_catalog([o for p in products for o in p.offers], session)
+    products = serialize_products(products, lat, lon)
+    if cursor is None:
+        return products
+
+    last_id, last_distance = results[-1]
+    return {
+        "products": products,
+        "next_cursor": encode_cursor(last_distance, last_id) if len(results) == page_size else None,
+    }
 
 # Transforma o resultado de uma query na tabela Product num objeto Product
 def serialize_product(p: Product, lat: float, lon: float) -> dict:
+    return serialize_products([p], lat, lon)[0]
+
+# Serializa uma página de produtos calculando as distâncias de todas as ofertas de uma vez.
+# Filiais e lojas das ofertas precisam estar no catálogo (load_offers_catalog).
+def serialize_products(products, lat: float, lon: float) -> list:
+    return serialize_products_offers([(p, p.offers) for p in products], lat, lon)
+
+# Serializa pares (produto, ofertas)
+def serialize_products_offers(products_offers, lat: float, lon: float) -> list:
+    branches = [catalog_cache.get("store_branch", o.id_store_branch) for _, offers in products_offers for o in offers]
+    distances = iter(haversine_batch(
+        lat, lon,
+        [branch.latitude for branch in branches],
+        [branch.longitude for branch in branches],
+    ).tolist())
 
-    prices = [o.current_price for o in p.offers if o.current_price is not None]
+    return [serialize_product_offers(p, offers, distances) for p, offers in products_offers]
+
+# Serializa um produto com as ofertas informadas; distances traz a distância de cada oferta, na ordem
+def serialize_product_offers(p: Product, offers, distances) -> dict:
+    prices = [o.current_price for o in offers if o.current_price is not None]
     avg_price = sum(prices) / len(prices) if prices else 0
 
+    stores = []
+    for o in offers:
+        branch = catalog_cache.get("store_branch", o.id_store_branch)
+        store = catalog_cache.get("store", branch.id_store)
+        stores.append({
+            "id" : branch.id_store,
+            # não faz parte da resposta (StoreOfferSchema): usado para recalcular a distância
+            "id_store_branch" : o.id_store_branch,
+            "name" : store.name,
+            "branch" : branch.description,
+            "current_price" : o.current_price,
+            "discount_percentage": round(
+                ((avg_price - o.current_price) / avg_price) * 100
+                if avg_price > 0 and o.current_price is not None
+                else 0
+            ),
+            "previous_price" : o.previous_price,
+            "expiration_offer" : o.expiration,
+            "logo" : store.logo,
+            "distance" : next(distances),
+        })
+
     return {
-            "id": p.id,
-            "name": p.name,
-            "description" : p.description,
-            "measure": p.measure,
-            "measure_type": p.measure_type,
-            "type" : p.type,
-            "origin" : p.origin,
-            "expiration": p.expiration,
-            "stores" : [
-                {
-                    "id" : o.store_branch.id_store,
-                    "name" : o.store_branch.store.name,
-                    "branch" : o.store_branch.description,
-                    "current_price" : o.current_price,
-                    "discount_percentage": round(
-                        ((avg_price - o.current_price) / avg_price) * 100
-                        if avg_price > 0 and o.current_price is not None
-                        else 0
-                    ),
-                    "previous_price" : o.previous_price,
-                    "expiration_offer" : o.expiration,
-                    "logo" : o.store_branch.store.logo,
-                    "distance" : haversine(lat, lon, o.store_branch.latitude, o.store_branch.longitude),
-                }
-                for o in p.offers
-            ]
-        }
-
-# Cálculo da distância entre duas coordenadas geográficas
-def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-
-    # converte graus para radianos
-    φ1, λ1 = math.radians(lat1), math.radians(lon1)
-    φ2, λ2 = math.radians(lat2), math.radians(lon2)
-
-    # diferenças
-    Δφ = φ2 - φ1
-    Δλ = λ2 - λ1
-
-    # haversine
-    a = math.sin(Δφ / 2)**2 + math.cos(φ1) * math.cos(φ2) * math.sin(Δλ / 2)**2
-    c = 2 * math.asin(math.sqrt(a))
-
-    # raio médio da Terra em metros
-    R = 6_371_000
-
-    return int(R * c)
+        "id": p.id,
+        "name": p.name,
+        "description" : p.description,
+        "measure": p.measure,
+        "measure_type": p.measure_type,
+        "type" : p.type,
+        "origin" : p.origin,
+        "expiration": p.expiration,
+        "stores" : stores,
+    }
+
+# Cálculo da distância entre duas coordenadas geográficas, em metros (haversine_km truncado)
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> int:
+    return int(haversine_km(lat1, lon1, lat2, lon2) * 1000)
+
+# Versão vetorizada: distâncias em metros de várias coordenadas (lats, lons) até o ponto
+# (lat, lon), numa só passada, com o mesmo truncamento para inteiro do haversine escalar
+def haversine_batch(lat: float, lon: float, lats, lons) -> np.ndarray:
+    return (haversine_km_batch(lat, lon, lats, lons) * 1000).astype(np.int64)
+
+# Cópia dos produtos já serializados (ex.: vindos do cache de respostas) com a distância de
+# cada oferta recalculada para a posição do usuário
+def with_offer_distances(products, lat: float, lon: float) -> list:
+    offers = [offer for product in products for offer in product["stores"]]
+    branches = [catalog_cache.get("store_branch", offer["id_store_branch"]) for offer in offers]
+    located = [branch for branch in branches if branch is not None]
+    distances = iter(haversine_batch(
+        lat, lon,
+        [branch.latitude for branch in located],
+        [branch.longitude for branch in located],
+    ).tolist())
+
+    # filial que saiu do catálogo mantém a distância anterior
+    offer_distances = iter([
+        offer["distance"] if branch is None else next(distances)
+        for offer, branch in zip(offers, branches)
+    ])
+    return [
+        {**product, "stores": [{**offer, "distance": next(offer_distances)} for offer in product["stores"]]}
+        for product in products
+    ]
 
+# Distância em metros (arredondada) calculada no banco, rotulada 'distance'
 def get_distance_expression(lat1: float, lon1: float, lat2: float, lon2: float):
-    return func.round(
-        6371000 * 2 * func.asin(
-            func.sqrt(
-                func.power((func.radians(lat2) - func.radians(lat1)) / 2, 2)
-                + func.cos(func.radians(lat1)) * func.cos(func.radians(lat2))
-                * func.power((func.radians(lon2) - func.radians(lon1)) / 2, 2)
-            )
-        )
-    ).label('distance')
-
-def process_products(products, lat: float, lon: float, page: int, limit: int):
-    # Função para calcular a porcentagem de desconto
-    def calculate_discount_pct(offers):
-        if not offers:
-            return 0
-        prices = [offer.current_price for offer in offers if offer.current_price is not None]
-        if not prices:
-            return 0
-        min_price = min(prices)
-        avg_price = sum(prices) / len(prices)
-        if avg_price == 0:
-            return 0
-        return ((avg_price - min_price) / avg_price) * 100
-
-    # Ordenar os produtos pela porcentagem de desconto
-    sorted_products = sorted(
-        products,
-        key=lambda p: calculate_discount_pct(p.offers),
-        reverse=True
+    return func.round(geo_distance(lat1, lon1, lat2, lon2) * 1000).label('distance')
+
+# Reordena as entidades na ordem dos ids informados (ordem do ranking feito no banco),
+# no lugar de um ORDER BY FIELD(...) que só existe no MySQL
+def sort_by_ids(entities, ids):
+    position = {id: i for i, id in enumerate(ids)}
+    return sorted(entities, key=lambda entity: position[entity.id])
+
+# Filtro indexável (BETWEEN) pelo retângulo que contém o raio em torno do ponto
+def get_bounding_box_filter(lat: float, lon: float, radius_km: float, branch=StoreBranch):
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    return [
+        branch.lat_cell.between(grid_cell(min_lat), grid_cell(max_lat)),
+        branch.lon_cell.between(grid_cell(min_lon), grid_cell(max_lon)),
+        branch.latitude.between(min_lat, max_lat),
+        branch.longitude.between(min_lon, max_lon),
+    ]
+
+# Ranking dos produtos pelo desconto do menor preço sobre o preço médio das ofertas válidas
+# nas filiais próximas, paginado por offset ou por cursor (desconto, id).
+# Limitação: o desconto é agregado só sobre as filiais no raio do usuário, então não existe uma
+# chave pré-calculada para buscar no WHERE. O filtro do cursor fica no HAVING e cada página
+# ainda agrega todas as ofertas das filiais próximas antes de descartar as já vistas. O cursor
+# dá páginas estáveis e a ordenação só guarda a página (com OFFSET, offset + página), mas não é
+# uma busca O(página). Os produtos da página são carregados depois, numa consulta só com eles.
+async def process_products(nearby_store_branches, id_category, lat: float, lon: float, page: int, limit: int, session: AsyncSession, cursor: str = None):
+    product_filters = get_product_filters(nearby_store_branches, id_category)
+
+    # porcentagem de desconto do menor preço em relação ao preço médio, calculada no banco
+    avg_price = func.avg(Offer.current_price)
+    discount_pct = case(
+        (avg_price == 0, 0),
+        else_=(avg_price - func.min(Offer.current_price)) * 100 / avg_price
     )
 
-    # cálculo do offset e do tamanho da página
-    start = (page - 1) * limit
-    end = start + limit
+    # ordena pelo desconto e pagina no banco: só os ids da página voltam
+    query = (
+        select(Offer.id_product, discount_pct)
+            .join(Product, Product.id == Offer.id_product)
+            .where(*product_filters)
+            .group_by(Offer.id_product)
+            .order_by(discount_pct.desc(), Offer.id_product)
+    )
 
-    # fatiar a lista para pegar apenas a "página" desejada
-    paginated_products = sorted_products[start:end]
+    # paginação por cursor (continua depois da chave (desconto, id), no HAVING: o desconto só
+    # existe depois do GROUP BY) ou por offset
+    if cursor is not None:
+        query = query.having(*get_keyset_filter(cursor, discount_pct, Offer.id_product, descending=True))
+    else:
+        query = query.offset((page - 1) * limit)
+    ranking = (await session.execute(query.limit(limit))).all()
+
+    product_ids = [id for id, _ in ranking]
+    if not product_ids:
+        return [] if cursor is None else {"products": [], "next_cursor": None}
+
+    # carrega apenas os produtos da página com as ofertas válidas
+    products = sort_by_ids((await session.scalars(
+        select(Product)
+            .join(Offer, Offer.id_product == Product.id)
+            .where(Product.id.in_(product_ids), *product_filters)
+            .options(*get_product_load_plan(contains_eager(Product.offers)))
+    )).unique().all(), product_ids)
 
     # Serializar os produtos da página
-    serialized_products = [
-        serialize_product(product, lat, lon)
-        for product in paginated_products
-    ]
+    await load_offers_catalog([o for p in products for o in p.offers], session)
+    products = serialize_products(products, lat, lon)
+    if cursor is None:
+        return products
 
-    return serialized_products
-    
-def get_nearby_store_branches(lat: float, lon: float, session: Session):
-    distance_threshold = 10  # km
-
-    # expressão de distância rotulada
-    distance_expr = (
-        6371 * func.acos(
-            func.cos(func.radians(lat)) * func.cos(func.radians(StoreBranch.latitude)) *
-            func.cos(func.radians(StoreBranch.longitude) - func.radians(lon)) +
-            func.sin(func.radians(lat)) * func.sin(func.radians(StoreBranch.latitude))
-        )
-    ).label("distance")
-
-    # montando a query: seleciona a entidade + o distance label
-    nearby_store_branches = (
-        session.query(StoreBranch, distance_expr)
-            .filter(distance_expr <= distance_threshold)
+    last_id, last_discount = ranking[-1]
+    return {
+        "products": products,
+        "next_cursor": encode_cursor(last_discount, last_id) if len(ranking) == limit else None,
+    }
+
+# Cursor opaco da paginação por chave: codifica a chave de ordenação do último item
+def encode_cursor(*key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(key, list) or len(key) != 2:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # chave (valor numérico finito, id inteiro); bool é subclasse de int e não vale
+    value, id = key
+    if (
+        isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value)
+        or isinstance(id, bool) or not isinstance(id, int)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+# Filtro da paginação por chave: itens depois de (valor, id) na ordem (sort_expr, id_column).
+# Cursor vazio significa primeira página.
+def get_keyset_filter(cursor: str, sort_expr, id_column, descending: bool = False):
+    if not cursor:
+        return []
+    value, id = decode_cursor(cursor)
+    after = sort_expr < value if descending else sort_expr > value
+    return [or_(after, and_(sort_expr == value, id_column > id))]
+
+# Consulta das filiais no raio (sem o índice em memória): colunas do catálogo + a distância
+# em km rotulada 'distance', da mais próxima, pré-filtrando pelo retângulo do raio (usa o
+# índice das células) antes do cálculo exato
+def get_nearby_store_branches_query(lat: float, lon: float, radius_km: float):
+    distance_expr = geo_distance(lat, lon, StoreBranch.latitude, StoreBranch.longitude).label("distance")
+    return (
+        select(*[getattr(StoreBranch, field) for field in CatalogStoreBranch._fields], distance_expr)
+            .where(*get_bounding_box_filter(lat, lon, radius_km))
+            .where(distance_expr <= radius_km)
             .order_by("distance")
-            .all()
     )
 
+# Filiais no raio com a distância em km: [(CatalogStoreBranch, km)], da mais próxima.
+# As filiais e suas lojas ficam garantidas no catálogo.
+async def get_nearby_store_branches(lat: float, lon: float, session: AsyncSession):
+    distance_threshold = NEARBY_RADIUS_KM  # km
+
+    # com o índice em memória carregado, as filiais vêm do catálogo, sem ir ao banco
+    if store_branch_index.ready:
+        nearby = store_branch_index.nearby(lat, lon, distance_threshold)
+        await catalog_cache.load_missing(session, "store_branch", [id for id, _ in nearby])
+        nearby_store_branches = [
+            (catalog_cache.get("store_branch", id), distance)
+            for id, distance in nearby
+            if catalog_cache.get("store_branch", id) is not None
+        ]
+    else:
+        rows = await session.execute(get_nearby_store_branches_query(lat, lon, distance_threshold))
+        nearby_store_branches = [(CatalogStoreBranch(*row[:-1]), row.distance) for row in rows]
+
+    await catalog_cache.load_missing(session, "store", {branch.id_store for branch, _ in nearby_store_branches})
     return nearby_store_branches
 
-def get_store_branch_products(nearby_store_branches, id_category, session: Session):
+# Filial mais próxima de cada loja no raio: [(id_filial, id_loja, km)], da mais próxima.
+# Com o índice em memória carregado, sai do índice e do catálogo, sem ir ao banco. Sem ele,
+# o banco escolhe a filial de cada loja (ROW_NUMBER() por loja, ordenado pela distância),
+# pré-filtrando pelo retângulo do raio (índice das células).
+async def get_nearest_store_branch_rows(lat: float, lon: float, radius_km: float, limit, session: AsyncSession):
+    if store_branch_index.ready:
+        nearby = store_branch_index.nearby(lat, lon, radius_km)
+        await catalog_cache.load_missing(session, "store_branch", [id for id, _ in nearby])
+
+        # o índice já vem ordenado por (distância, id): a primeira filial de cada loja é a mais próxima
+        rows, stores = [], set()
+        for id_branch, distance in nearby:
+            branch = catalog_cache.get("store_branch", id_branch)
+            if branch is None or branch.id_store in stores:
+                continue
+            stores.add(branch.id_store)
+            rows.append((id_branch, branch.id_store, distance))
+        return rows if limit is None else rows[:limit]
+
+    distance_expr = geo_distance(lat, lon, StoreBranch.latitude, StoreBranch.longitude)
+
+    ranked = (
+        select(
+            StoreBranch.id.label("id_branch"),
+            StoreBranch.id_store,
+            distance_expr.label("distance"),
+            func.row_number().over(
+                partition_by=StoreBranch.id_store,
+                order_by=(distance_expr, StoreBranch.id),
+            ).label("position"),
+        )
+        .where(*get_bounding_box_filter(lat, lon, radius_km))
+        .where(distance_expr <= radius_km)
+        .subquery()
+    )
+
+    query = (
+        select(ranked.c.id_branch, ranked.c.id_store, ranked.c.distance)
+            .where(ranked.c.position == 1)
+            .order_by(ranked.c.distance, ranked.c.id_branch)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return (await session.execute(query)).all()
+
+# Lojas mais próximas, cada uma pela sua filial mais próxima (nome e logo do catálogo).
+# Sem limit: todas as lojas no raio de NEARBY_RADIUS_KM. Com limit (k): se houver menos de k
+# lojas no raio, dobra o raio até achar k ou chegar a NEAREST_STORES_MAX_RADIUS_KM — cada
+# tentativa continua limitada ao retângulo do raio, sem varrer a tabela inteira.
+async def get_nearest_stores(lat: float, lon: float, session: AsyncSession, limit=None):
+    radius_km = NEARBY_RADIUS_KM
+    rows = await get_nearest_store_branch_rows(lat, lon, radius_km, limit, session)
+    while limit is not None and len(rows) < limit and radius_km < NEAREST_STORES_MAX_RADIUS_KM:
+        radius_km = min(radius_km * 2, NEAREST_STORES_MAX_RADIUS_KM)
+        rows = await get_nearest_store_branch_rows(lat, lon, radius_km, limit, session)
+
+    await catalog_cache.load_missing(session, "store", {id_store for _, id_store, _ in rows})
+    await catalog_cache.load_missing(session, "store_branch", {id_branch for id_branch, _, _ in rows})
+
+    nearest_stores = []
+    for id_branch, id_store, distance in rows:
+        store = catalog_cache.get("store", id_store)
+        branch = catalog_cache.get("store_branch", id_branch)
+        if store is None or branch is None:
+            continue
+        nearest_stores.append({
+            "id": store.id,
+            "name": store.name,
+            "distance": round(distance * 1000),  # Convertendo de km para metros
+            "logo": store.logo,
+            "id_branch": branch.id,
+            "branch": branch.description,
+        })
+    return nearest_stores
+
+# Filtros das ofertas válidas nas filiais próximas (e da categoria, se houver)
+def get_product_filters(nearby_store_branches, id_category):
 
     # Obter os IDs das filiais próximas
     store_branch_ids = [sb.id for sb, _ in nearby_store_branches]
@@ -248,11 +523,95 @@ def get_store_branch_products(nearby_store_branches, id_category, session: Sessi
     if id_category is not None:
         product_filters.append(Product.id_category == id_category)
 
-    products = (
-        session.query(Product)
+    return product_filters
+
+# Vários produtos por id, cada um só com as ofertas válidas das filiais próximas, num único
+# SELECT (filiais e lojas vêm do catálogo): {id: produto serializado ou None}, na ordem dos ids
+async def get_products_batch(ids, nearby_store_branches, lat: float, lon: float, session: AsyncSession):
+    ids = list(dict.fromkeys(ids))
+    products = (await session.scalars(
+        select(Product)
+            .outerjoin(Offer, and_(Offer.id_product == Product.id, *get_product_filters(nearby_store_branches, None)))
+            .where(Product.id.in_(ids))
+            .order_by(Product.id, Offer.id)
+            .options(*get_product_load_plan(contains_eager(Product.offers)))
+    )).unique().all()
+
+    serialized = {product["id"]: product for product in serialize_products(products, lat, lon)}
+    return {id: serialized.get(id) for id in ids}
+
+# Total da lista em cada loja: menor preço de cada produto entre as filiais próximas da loja.
+# Lojas com mais produtos da lista primeiro e, entre elas, a de menor total.
+def get_store_baskets(products: dict) -> list:
+    baskets = {}
+    for id_product, product in products.items():
+        if product is None:
+            continue
+        for offer in product["stores"]:
+            basket = baskets.setdefault(offer["id"], {
+                "id": offer["id"], "name": offer["name"], "logo": offer["logo"], "prices": {},
+            })
+            price = basket["prices"].get(id_product)
+            if price is None or offer["current_price"] < price:
+                basket["prices"][id_product] = offer["current_price"]
+
+    result = []
+    for basket in baskets.values():
+        prices = basket.pop("prices")
+        result.append({
+            **basket,
+            "total": round(sum(prices.values()), 2),
+            "items": len(prices),
+            "missing": [id for id, product in products.items() if product is not None and id not in prices],
+        })
+    result.sort(key=lambda basket: (len(basket["missing"]), basket["total"], basket["id"]))
+    return result
+
+# Todos os produtos com ofertas válidas nas filiais próximas, um produto por vez, sem carregar
+# o resultado inteiro: as linhas (produto, oferta) vêm do banco em blocos de EXPORT_YIELD_PER
+# (cursor do lado do servidor quando o driver suporta), ordenadas por produto, e cada produto
+# é serializado assim que suas ofertas terminam. Filiais e lojas não entram no SELECT: vêm do
+# catálogo, carregadas antes de abrir o cursor.
+async def stream_store_branch_products(nearby_store_branches, id_category, lat: float, lon: float, session: AsyncSession):
+    product_filters = get_product_filters(nearby_store_branches, id_category)
+
+    # as ofertas são só das filiais próximas; sem o índice em memória elas vêm do banco e
+    # podem ainda não estar no catálogo (as lojas get_nearby_store_branches já carregou)
+    await catalog_cache.load_missing(session, "store_branch", [branch.id for branch, _ in nearby_store_branches])
+
+    result = await session.stream(
+        select(Product, Offer)
             .join(Offer, Offer.id_product == Product.id)
-            .filter(*product_filters)
-            .options(contains_eager(Product.offers))
-            .all()
+            .where(*product_filters)
+            .order_by(Product.id, Offer.id)
+            .execution_options(yield_per=EXPORT_YIELD_PER)
     )
-    return products
\ No newline at end of file
+
+    product, offers = None, []
+    async for partition in result.partitions():
+        completed = []
+        for row_product, offer in partition:
+            if product is not None and row_product.id != product.id:
+                completed.append((product, offers))
+                offers = []
+            product = row_product
+            offers.append(offer)
+        yield serialize_products_offers(completed, lat, lon)
+
+    if product is not None:
+        yield serialize_products_offers([(product, offers)], lat, lon)
+
+# Categorias dos produtos com ofertas válidas nas filiais próximas
+async def get_store_branch_categories(nearby_store_branches, session: AsyncSession):
+    product_filters = get_product_filters(nearby_store_branches, None)
+
+    # só os ids no banco; nome e ícone vêm do catálogo
+    category_ids = (await session.scalars(
+        select(Product.id_category)
+            .join(Offer, Offer.id_product == Product.id)
+            .where(*product_filters, Product.id_category.is_not(None))
+            .distinct()
+            .order_by(Product.id_category)
+    )).all()
+    await catalog_cache.load_missing(session, "category", category_ids)
+    return catalog_cache.many("category", category_ids)
@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from database.models import MeasureType
+from datetime import date
+from typing import Optional
 
 # Register User
 class UserScheme(BaseModel):
@@ -15,4 +18,86 @@ class LoginSchema(BaseModel):
     password: str
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Linha da ingestão de ofertas em lote (CSV/NDJSON)
+class OfferIngestSchema(BaseModel):
+    id_product: int
+    id_store_branch: int
+    current_price: float = Field(gt=0)
+    expiration: date
+
+# Busca de vários produtos de uma vez (lista de compras), com a posição do usuário
+class ProductBatchRequestSchema(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=100)
+    lat: float
+    lon: float
+
+# Respostas da API: o FastAPI valida e gera o JSON direto pelo Pydantic (sem jsonable_encoder)
+
+# Oferta de um produto numa filial
+class StoreOfferSchema(BaseModel):
+    id: int
+    name: str
+    branch: str
+    current_price: float
+    discount_percentage: int
+    previous_price: Optional[float] = None
+    expiration_offer: date
+    logo: Optional[str] = None
+    distance: int
+
+class ProductSchema(BaseModel):
+    id: int
+    name: str
+    description: str
+    measure: int
+    measure_type: MeasureType
+    type: str
+    origin: str
+    expiration: int
+    stores: list[StoreOfferSchema]
+
+# Página da paginação por cursor
+class ProductPageSchema(BaseModel):
+    products: list[ProductSchema]
+    next_cursor: Optional[str] = None
+
+# Lista de compras numa loja: soma do menor preço de cada produto nas filiais próximas
+class StoreBasketSchema(BaseModel):
+    id: int
+    name: str
+    logo: Optional[str] = None
+    total: float
+    items: int
+    missing: list[int]
+
+# Produtos por id (null para id inexistente) e as listas por loja, da mais barata
+class ProductBatchSchema(BaseModel):
+    products: dict[int, Optional[ProductSchema]]
+    baskets: list[StoreBasketSchema]
+
+class CategorySchema(BaseModel):
+    id: int
+    name: str
+    url_icon: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+# Loja próxima (filial mais perto), distância em metros
+class NearbyStoreSchema(BaseModel):
+    id: int
+    name: str
+    distance: int
+    logo: Optional[str] = None
+
+# Loja mais próxima com a filial usada no cálculo da distância (/store/nearby)
+class NearestStoreSchema(NearbyStoreSchema):
+    id_branch: int
+    branch: str
+
+class HomeSchema(BaseModel):
+    products: list[ProductSchema]
+    categories: list[CategorySchema]
+    nearby_stores: list[NearbyStoreSchema]
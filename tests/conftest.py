@@ -0,0 +1,63 @@
+# Ambiente dos testes: banco SQLite temporário com o catálogo sintético dos benchmarks.
+# As variáveis precisam estar definidas antes de importar a aplicação.
+import os
+import tempfile
+
+os.environ["BENCHMARK_DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.sqlite")
+os.environ["RESPONSE_CACHE"] = "off"
+
+from benchmarks.env import CITIES
+from benchmarks.seed import generate_catalog, seed_database
+from database.database import Base
+from database.models import MeasureType, Store, StoreBranch, Product
+from routes.geo_index import store_branch_index
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+import main
+import pytest
+
+# usuário no centro da primeira cidade do catálogo sintético
+USER_LAT, USER_LON = CITIES[0][1:]
+
+@pytest.fixture(scope="session")
+def catalog():
+    catalog = generate_catalog(stores=10, branches=200, categories=8, products=1000, offers_per_product=10)
+    seed_database(catalog)
+    return catalog
+
+@pytest.fixture(scope="session")
+def client(catalog):
+    with TestClient(main.app) as client:
+        yield client
+
+# Roda o teste com o índice espacial das filiais carregado e desligado (consulta SQL)
+@pytest.fixture(params=[True, False], ids=["index", "sql"])
+def store_branch_index_ready(request, client):
+    ready = store_branch_index.ready
+    store_branch_index.ready = request.param
+    yield request.param
+    store_branch_index.ready = ready
+
+# SQLite em memória com uma loja, duas filiais e dois produtos, para testes que gravam
+# (fica fora do catálogo compartilhado pelos testes das rotas)
+@pytest.fixture
+def memory_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Store), [{"id": 1, "name": "Store"}])
+        connection.execute(insert(StoreBranch), [
+            {"id": id, "id_store": 1, "description": "Branch", "latitude": 0, "longitude": 0, "lat_cell": 0, "lon_cell": 0}
+            for id in (1, 2)
+        ])
+        connection.execute(insert(Product), [
+            {"id": id, "name": f"Product {id}", "description": "d", "measure": 1, "measure_type": MeasureType.WEIGHT,
+             "type": "t", "origin": "o", "expiration": 1}
+            for id in (1, 2)
+        ])
+
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
@@ -0,0 +1,43 @@
+from database import archive
+from database.models import Offer, OfferArchive
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import OperationalError
+from datetime import date, timedelta
+
+import pytest
+
+EXPIRED = date.today() - timedelta(days=1)
+
+def add_offer(session, id, current_price, expiration=EXPIRED, id_store_branch=1):
+    session.execute(insert(Offer), [{
+        "id": id, "id_product": 1, "id_store_branch": id_store_branch, "current_price": current_price, "expiration": expiration,
+    }])
+    session.commit()
+
+# Um id de oferta reaproveitado depois do arquivamento é arquivado de novo sem colidir
+def test_reused_offer_id_is_archived_again(memory_session):
+    add_offer(memory_session, 7, 10.0)
+    add_offer(memory_session, 8, 12.0, expiration=date.today(), id_store_branch=2)
+    assert archive.archive_expired_offers(memory_session)["moved"] == 1
+
+    add_offer(memory_session, 7, 9.0)
+    report = archive.archive_expired_offers(memory_session)
+    assert report["moved"] == 1
+    assert report["error"] is None
+
+    archived = memory_session.execute(select(OfferArchive.id_offer, OfferArchive.current_price).order_by(OfferArchive.id)).all()
+    assert archived == [(7, 10.0), (7, 9.0)]
+    assert memory_session.scalars(select(Offer.id)).all() == [8]
+
+# A falha é repassada e fica no relatório exposto em /metrics/archive
+def test_failure_is_reported(memory_session):
+    add_offer(memory_session, 1, 10.0)
+    memory_session.execute(text("DROP TABLE offer_archive"))
+    memory_session.commit()
+
+    with pytest.raises(OperationalError):
+        archive.archive_expired_offers(memory_session)
+
+    assert archive.last_report["moved"] == 0
+    assert archive.last_report["error"].startswith("OperationalError: no such table: offer_archive")
+    assert memory_session.scalars(select(Offer.id)).all() == [1]
@@ -0,0 +1,24 @@
+from benchmarks.env import BENCHMARK_USER_EMAIL, BENCHMARK_USER_PASSWORD
+from conftest import USER_LAT, USER_LON
+from main import password_hasher
+
+LOGIN = {"email": BENCHMARK_USER_EMAIL, "password": BENCHMARK_USER_PASSWORD}
+
+def test_login(client):
+    response = client.post("/auth/login", json=LOGIN)
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "Bearer"
+
+# Com as threads do bcrypt ocupadas e a fila cheia, o login responde 503 na hora
+# (sem esperar por uma thread) e as rotas que não usam o bcrypt continuam atendendo
+def test_login_is_rejected_when_hasher_is_full(client, monkeypatch):
+    monkeypatch.setattr(password_hasher, "pending", password_hasher.max_pending)
+
+    response = client.post("/auth/login", json=LOGIN)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    assert client.get("/home", params={"lat": USER_LAT, "lon": USER_LON}).status_code == 200
+
+    monkeypatch.setattr(password_hasher, "pending", password_hasher.max_pending - 1)
+    assert client.post("/auth/login", json=LOGIN).status_code == 200
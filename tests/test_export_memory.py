@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import json
+import os
+import subprocess
+import sys
+
+# O engine, o catálogo e o índice são globais do processo (e o conftest já aponta o banco para
+# o catálogo compartilhado): cada tamanho roda num processo próprio, com banco próprio, e mede
+# o pico de memória (tracemalloc) de export_lines, o gerador por trás de /product/export.
+# Catálogo frio e sem o índice em memória: as filiais vêm do banco. Com EXPORT_YIELD_PER
+# menor, poucos milhares de produtos já passam por vários blocos do cursor.
+EXPORT_SCRIPT = """
+import asyncio, json, os, sys, tempfile
+
+os.environ["BENCHMARK_DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "export.sqlite")
+
+from benchmarks.seed import generate_catalog, seed_database
+from benchmarks.micro import bench_export_memory
+
+import routes.utils
+
+routes.utils.EXPORT_YIELD_PER = 100
+seed_database(generate_catalog(stores=5, branches=50, categories=5, products=int(sys.argv[1]), offers_per_product=10))
+print(json.dumps(asyncio.run(bench_export_memory(0))))
+"""
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def export_memory(products: int) -> dict:
+    env = {**os.environ, "RESPONSE_CACHE": "off"}
+    env.pop("BENCHMARK_DATABASE_URL", None)
+    result = subprocess.run(
+        [sys.executable, "-c", EXPORT_SCRIPT, str(products)],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_export_peak_memory_does_not_grow_with_dataset():
+    small = export_memory(2000)
+    large = export_memory(8000)
+
+    assert large["products"] >= 3 * small["products"]
+    assert large["peak_kib"] <= small["peak_kib"] * 1.25
@@ -0,0 +1,52 @@
+from database.geo import geo_distance, haversine_km, haversine_km_batch, register_geo_functions
+from routes.utils import haversine, haversine_batch
+from sqlalchemy import create_engine, literal, select
+from sqlalchemy.engine.default import DefaultDialect
+from sqlalchemy.exc import OperationalError
+
+import random
+import pytest
+
+# pares de pontos de curtos (mesma cidade) a longos (outro continente), e antípodas
+def point_pairs():
+    rng = random.Random(1)
+    pairs = [((-23.5505, -46.6333), (-23.5505 + d, -46.6333 + d)) for d in (0, 1e-5, 0.001, 0.05, 1, 10)]
+    pairs += [((0.0, 0.0), (0.0, 180.0)), ((89.9, 10.0), (-89.9, -170.0))]
+    pairs += [
+        ((rng.uniform(-80, 80), rng.uniform(-180, 180)), (rng.uniform(-80, 80), rng.uniform(-180, 180)))
+        for _ in range(200)
+    ]
+    return pairs
+
+# Escalar, vetorizada (km e metros) e a função geo_distance do SQLite concordam em até 1 m
+def test_haversine_implementations_agree():
+    pairs = point_pairs()
+    engine = create_engine("sqlite://")
+    register_geo_functions(engine)
+
+    with engine.connect() as connection:
+        for (lat1, lon1), (lat2, lon2) in pairs:
+            scalar_km = haversine_km(lat1, lon1, lat2, lon2)
+            sql_km = connection.execute(select(geo_distance(lat1, lon1, lat2, lon2))).scalar_one()
+            batch_km = haversine_km_batch(lat1, lon1, [lat2], [lon2])[0]
+
+            assert abs(sql_km - scalar_km) * 1000 <= 1
+            assert abs(batch_km - scalar_km) * 1000 <= 1
+            assert abs(haversine(lat1, lon1, lat2, lon2) - scalar_km * 1000) <= 1
+            assert abs(haversine_batch(lat1, lon1, [lat2], [lon2])[0] - scalar_km * 1000) <= 1
+    engine.dispose()
+
+# A compilação padrão de geo_distance (PostgreSQL, SQL Server, ...) usa a mesma fórmula e raio;
+# executada no SQLite quando ele tem as funções matemáticas (3.35+)
+def test_generic_sql_geo_distance_agrees():
+    engine = create_engine("sqlite://")
+    with engine.connect() as connection:
+        for (lat1, lon1), (lat2, lon2) in point_pairs():
+            expression = geo_distance(literal(lat1), literal(lon1), literal(lat2), literal(lon2))
+            sql = str(select(expression).compile(dialect=DefaultDialect(), compile_kwargs={"literal_binds": True}))
+            try:
+                sql_km = connection.exec_driver_sql(sql).scalar_one()
+            except OperationalError:
+                pytest.skip("SQLite sem funções matemáticas")
+            assert abs(sql_km - haversine_km(lat1, lon1, lat2, lon2)) * 1000 <= 1
+    engine.dispose()
@@ -0,0 +1,100 @@
+from database.models import Offer, ProductPriceStats
+from dependencies import verify_admin
+from ingest import IngestReport, OfferRowParser, ingest_offers, upsert_offer_batch
+from schemas import OfferIngestSchema
+from sqlalchemy import select
+from datetime import date, timedelta
+
+import ingest
+import main
+
+VALID_UNTIL = date.today() + timedelta(days=10)
+
+def offer_rows(*offers):
+    return [
+        OfferIngestSchema(id_product=id_product, id_store_branch=id_store_branch, current_price=price, expiration=expiration)
+        for id_product, id_store_branch, price, expiration in offers
+    ]
+
+def stored_offers(session):
+    return session.execute(
+        select(Offer.id_product, Offer.id_store_branch, Offer.current_price, Offer.previous_price, Offer.expiration)
+        .order_by(Offer.id_product, Offer.id_store_branch)
+    ).all()
+
+# Inserção, troca de preço (o preço atual vai para previous_price), troca só da validade,
+# linha repetida sem mudança e produto inexistente
+def test_upsert_offer_batch(memory_session):
+    report = IngestReport()
+    upsert_offer_batch(memory_session, offer_rows((1, 1, 10.0, VALID_UNTIL), (1, 2, 12.0, VALID_UNTIL), (2, 1, 5.0, VALID_UNTIL)), report)
+    memory_session.commit()
+    assert (report.inserted, report.updated, report.unchanged) == (3, 0, 0)
+
+    later = VALID_UNTIL + timedelta(days=5)
+    report = IngestReport()
+    upsert_offer_batch(memory_session, offer_rows(
+        (1, 1, 8.0, later),         # preço novo
+        (1, 2, 12.0, later),        # só a validade
+        (2, 1, 5.0, VALID_UNTIL),   # sem mudança
+        (99, 1, 1.0, VALID_UNTIL),  # produto inexistente
+    ), report)
+    memory_session.commit()
+
+    assert (report.inserted, report.updated, report.unchanged, report.rejected) == (0, 2, 1, 1)
+    assert report.errors == [{"id_product": 99, "id_store_branch": 1, "error": "Unknown product"}]
+    assert stored_offers(memory_session) == [
+        (1, 1, 8.0, 10.0, later),
+        (1, 2, 12.0, None, later),
+        (2, 1, 5.0, None, VALID_UNTIL),
+    ]
+
+    # as estatísticas de preço acompanham as gravações em lote
+    stats = memory_session.get(ProductPriceStats, 1)
+    assert (stats.min_price, stats.avg_price, stats.offer_count) == (8.0, 10.0, 2)
+
+# Outra ingestão cria a mesma chave entre a consulta das existentes e o INSERT: a linha
+# vira um UPDATE em vez de violar a unicidade e derrubar o lote
+def test_upsert_offer_batch_concurrent_insert(memory_session, monkeypatch):
+    upsert_offer_batch(memory_session, offer_rows((1, 1, 10.0, VALID_UNTIL)), IngestReport())
+    memory_session.commit()
+
+    monkeypatch.setattr(ingest, "_existing_offers", lambda *args: {})
+    upsert_offer_batch(memory_session, offer_rows((1, 1, 7.0, VALID_UNTIL), (2, 1, 3.0, VALID_UNTIL)), IngestReport())
+    memory_session.commit()
+
+    assert stored_offers(memory_session) == [
+        (1, 1, 7.0, 10.0, VALID_UNTIL),
+        (2, 1, 3.0, None, VALID_UNTIL),
+    ]
+
+# Lotes de batch_size com commit em cada um, a partir de CSV
+def test_ingest_offers_in_batches(memory_session):
+    lines = ["id_product,id_store_branch,current_price,expiration"] + [
+        f"{id_product},{id_store_branch},{id_product + id_store_branch},{VALID_UNTIL}"
+        for id_product in (1, 2) for id_store_branch in (1, 2)
+    ] + ["1,1,not a price,2030-01-01"]
+    report = ingest_offers(memory_session, lines, "csv", batch_size=3)
+
+    assert report.as_dict()["inserted"] == 4
+    assert report.rejected == 1
+    assert report.errors[0]["line"] == 6
+    assert len(stored_offers(memory_session)) == 4
+
+def test_parser_rejects_invalid_utf8():
+    parser = OfferRowParser("ndjson")
+    row, error = parser.parse(b'{"id_product": 1, "name": "caf\xe9"}')
+    assert row is None
+    assert error["line"] == 1
+    assert "utf-8" in error["error"]
+
+# Corpo com uma linha que não é UTF-8: a linha é rejeitada no relatório, sem erro 500
+def test_ingest_route_rejects_invalid_utf8_line(client):
+    main.app.dependency_overrides[verify_admin] = lambda: None
+    try:
+        response = client.post("/offer/ingest", content=b"\xff\xfe\n")
+    finally:
+        main.app.dependency_overrides.pop(verify_admin)
+
+    assert response.status_code == 200
+    assert response.json()["rejected"] == 1
+    assert response.json()["errors"][0]["line"] == 1
@@ -0,0 +1,50 @@
+from benchmarks.env import CITIES
+from database.database import engine
+from database.geo import NEARBY_RADIUS_KM, geo_distance
+from database.models import StoreBranch
+from routes.geo_index import store_branch_index
+from routes.utils import get_nearby_store_branches_query
+from sqlalchemy import select
+
+import pytest
+import random
+
+RADII_KM = [1, NEARBY_RADIUS_KM, 50]
+
+# Centros das cidades e pontos sorteados ao redor deles (até ~30 km)
+def sample_positions(count=60, seed=42):
+    rng = random.Random(seed)
+    positions = [(lat, lon) for _, lat, lon, *_ in CITIES]
+    for _ in range(count):
+        _, lat, lon, *_ = rng.choice(CITIES)
+        positions.append((lat + rng.uniform(-0.3, 0.3), lon + rng.uniform(-0.3, 0.3)))
+    return positions
+
+# Mesma busca sem o pré-filtro do retângulo: calcula a distância de todas as filiais
+def unfiltered_query(lat: float, lon: float, radius_km: float):
+    distance_expr = geo_distance(lat, lon, StoreBranch.latitude, StoreBranch.longitude).label("distance")
+    return select(StoreBranch.id, distance_expr).where(distance_expr <= radius_km)
+
+def branch_distances(rows):
+    return sorted((id, round(distance, 6)) for id, distance in rows)
+
+@pytest.mark.parametrize("radius_km", RADII_KM)
+def test_prefiltered_query_matches_unfiltered(catalog, radius_km):
+    with engine.connect() as connection:
+        for lat, lon in sample_positions():
+            prefiltered = connection.execute(get_nearby_store_branches_query(lat, lon, radius_km)).all()
+            unfiltered = connection.execute(unfiltered_query(lat, lon, radius_km)).all()
+
+            assert branch_distances((row.id, row.distance) for row in prefiltered) == branch_distances(unfiltered)
+            # ordem da mais próxima para a mais distante
+            assert [row.distance for row in prefiltered] == sorted(row.distance for row in prefiltered)
+
+# O índice em memória devolve as mesmas filiais que a consulta sem pré-filtro
+@pytest.mark.parametrize("radius_km", RADII_KM)
+def test_store_branch_index_matches_unfiltered(client, radius_km):
+    assert store_branch_index.ready
+
+    with engine.connect() as connection:
+        for lat, lon in sample_positions():
+            unfiltered = connection.execute(unfiltered_query(lat, lon, radius_km)).all()
+            assert branch_distances(store_branch_index.nearby(lat, lon, radius_km)) == branch_distances(unfiltered)
@@ -0,0 +1,84 @@
+from database.database import Base
+from database.geo import NEAREST_STORES_MAX_RADIUS_KM, grid_cell, register_geo_functions
+from database.models import Store, StoreBranch
+from routes.catalog import CatalogCache
+from routes.geo_index import StoreBranchIndex
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+import asyncio
+import pytest
+import routes.utils
+
+# ~111.19 km por grau de longitude no equador
+KM_PER_DEGREE = 111.19
+
+# Lojas esparsas ao longo do equador, a leste do usuário em (0, 0): (loja, filial, km).
+# A loja 2 tem duas filiais; a loja 5 fica além do raio máximo.
+BRANCHES = [(1, 1, 5), (2, 2, 30), (2, 3, 60), (3, 4, 100), (4, 5, 500), (5, 6, 700)]
+
+# Catálogo esparso num SQLite em memória; com index=True as filiais vêm do índice em memória
+def nearest_stores(monkeypatch, index: bool, limit):
+    radii = []
+    get_rows = routes.utils.get_nearest_store_branch_rows
+
+    async def get_nearest_store_branch_rows(lat, lon, radius_km, limit, session):
+        radii.append(radius_km)
+        return await get_rows(lat, lon, radius_km, limit, session)
+
+    store_branch_index = StoreBranchIndex()
+    monkeypatch.setattr(routes.utils, "catalog_cache", CatalogCache())
+    monkeypatch.setattr(routes.utils, "store_branch_index", store_branch_index)
+    monkeypatch.setattr(routes.utils, "get_nearest_store_branch_rows", get_nearest_store_branch_rows)
+
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        register_geo_functions(engine.sync_engine)
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(insert(Store), [{"id": id, "name": f"Store {id}"} for id in range(1, 6)])
+            await connection.execute(insert(StoreBranch), [
+                {"id": id_branch, "id_store": id_store, "description": f"Branch {id_branch}",
+                 "latitude": 0.0, "longitude": km / KM_PER_DEGREE, "lat_cell": 0, "lon_cell": grid_cell(km / KM_PER_DEGREE)}
+                for id_store, id_branch, km in BRANCHES
+            ])
+
+        try:
+            async with AsyncSession(engine) as session:
+                if index:
+                    await session.run_sync(store_branch_index.build)
+                return await routes.utils.get_nearest_stores(0.0, 0.0, session, limit)
+        finally:
+            await engine.dispose()
+
+    stores = asyncio.run(run())
+    return [(store["id"], store["id_branch"], round(store["distance"] / 1000)) for store in stores], radii
+
+@pytest.fixture(params=[True, False], ids=["index", "sql"])
+def index(request):
+    return request.param
+
+def test_no_expansion_when_radius_has_enough_stores(monkeypatch, index):
+    stores, radii = nearest_stores(monkeypatch, index, 1)
+    assert stores == [(1, 1, 5)]
+    assert radii == [10]
+
+# O raio dobra até achar k lojas; cada loja vem pela filial mais próxima
+def test_radius_doubles_until_k_stores(monkeypatch, index):
+    stores, radii = nearest_stores(monkeypatch, index, 3)
+    assert stores == [(1, 1, 5), (2, 2, 30), (3, 4, 100)]
+    assert radii == [10, 20, 40, 80, 160]
+
+# Com menos de k lojas até o raio máximo, para nele e devolve as que achou
+def test_radius_stops_at_maximum(monkeypatch, index):
+    stores, radii = nearest_stores(monkeypatch, index, 10)
+    assert stores == [(1, 1, 5), (2, 2, 30), (3, 4, 100), (4, 5, 500)]
+    assert radii == [10, 20, 40, 80, 160, 320, 640]
+    assert radii[-1] == NEAREST_STORES_MAX_RADIUS_KM
+
+# Sem limit: só as lojas no raio padrão, sem expandir
+def test_without_limit_uses_nearby_radius(monkeypatch, index):
+    stores, radii = nearest_stores(monkeypatch, index, None)
+    assert stores == [(1, 1, 5)]
+    assert radii == [10]
@@ -0,0 +1,46 @@
+from conftest import USER_LAT, USER_LON
+
+import base64
+import pytest
+
+# Página e limite começam em 1: valores menores gerariam OFFSET negativo
+@pytest.mark.parametrize("url", ["/product/", "/product/best-offers", "/store/1/products"])
+@pytest.mark.parametrize("params", [{"page": 0}, {"page": -1}, {"limit": 0}])
+def test_page_and_limit_must_be_positive(client, url, params):
+    response = client.get(url, params={"lat": USER_LAT, "lon": USER_LON, **params})
+    assert response.status_code == 422
+
+def encoded(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+# Cursores que não decodificam para (valor numérico, id inteiro) são rejeitados com 400
+INVALID_CURSORS = [
+    "W3t9LDFd",  # [{}, 1]
+    "not base64!",
+    encoded("[1]"),
+    encoded('{"a": 1}'),
+    encoded('[1, "2"]'),
+    encoded("[1, 2.5]"),
+    encoded("[true, 1]"),
+    encoded("[1, false]"),
+    encoded("[null, 1]"),
+    encoded("[NaN, 1]"),
+    encoded("[Infinity, 1]"),
+]
+
+@pytest.mark.parametrize("url", ["/product/", "/product/best-offers", "/store/1/products"])
+@pytest.mark.parametrize("cursor", INVALID_CURSORS)
+def test_invalid_cursor_is_rejected(client, url, cursor):
+    response = client.get(url, params={"lat": USER_LAT, "lon": USER_LON, "cursor": cursor})
+    assert response.status_code == 400
+
+# O next_cursor devolvido continua a listagem na página seguinte
+@pytest.mark.parametrize("url", ["/product/", "/product/best-offers", "/store/1/products"])
+def test_next_cursor_is_accepted(client, url):
+    params = {"lat": USER_LAT, "lon": USER_LON, "limit": 2}
+    first = client.get(url, params={**params, "cursor": ""}).json()
+    assert first["next_cursor"]
+
+    second = client.get(url, params={**params, "cursor": first["next_cursor"]})
+    assert second.status_code == 200
+    assert {p["id"] for p in second.json()["products"]}.isdisjoint(p["id"] for p in first["products"])
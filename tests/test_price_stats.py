@@ -0,0 +1,89 @@
+from database.database import Base
+from database.geo import register_geo_functions
+from database.models import Offer, ProductPriceStats, Store, StoreBranch, Product, MeasureType
+from routes.catalog import CatalogCache
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+from datetime import date, timedelta
+
+import asyncio
+import routes.utils
+
+TODAY = date.today()
+YESTERDAY = TODAY - timedelta(days=1)
+
+def price_stats(session, id_product=1):
+    stats = session.get(ProductPriceStats, id_product, populate_existing=True)
+    if stats is None:
+        return None
+    return stats.min_price, round(stats.avg_price, 2), stats.offer_count, stats.id_best_offer
+
+# O after_flush recalcula as estatísticas dos produtos das ofertas inseridas, alteradas,
+# vencidas e removidas, antes do commit
+def test_offer_changes_refresh_price_stats(memory_session):
+    cheap = Offer(id_product=1, id_store_branch=1, current_price=10.0, expiration=TODAY)
+    expensive = Offer(id_product=1, id_store_branch=2, current_price=20.0, expiration=TODAY + timedelta(days=5))
+    memory_session.add_all([cheap, expensive])
+    memory_session.flush()
+    assert price_stats(memory_session) == (10.0, 15.0, 2, cheap.id)
+
+    cheap.current_price = 30.0
+    memory_session.flush()
+    assert price_stats(memory_session) == (20.0, 25.0, 2, expensive.id)
+
+    expensive.expiration = YESTERDAY
+    memory_session.flush()
+    assert price_stats(memory_session) == (30.0, 30.0, 1, cheap.id)
+
+    memory_session.delete(cheap)
+    memory_session.flush()
+    assert price_stats(memory_session) is None
+
+    # só o produto alterado é recalculado
+    memory_session.add(Offer(id_product=2, id_store_branch=1, current_price=5.0, expiration=TODAY))
+    memory_session.commit()
+    assert price_stats(memory_session, 2)[:3] == (5.0, 5.0, 1)
+    assert price_stats(memory_session) is None
+
+# Estatísticas calculadas ontem com uma oferta que venceu: a primeira listagem do dia as
+# recalcula e o produto continua em /product/best-offers, agora com a oferta ainda válida
+def test_best_offers_refresh_stale_price_stats(monkeypatch):
+    monkeypatch.setattr(routes.utils, "catalog_cache", CatalogCache())
+    monkeypatch.setattr(routes.utils, "_price_stats_refreshed_on", None)
+
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        register_geo_functions(engine.sync_engine)
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(insert(Store), [{"id": 1, "name": "Store"}])
+            await connection.execute(insert(StoreBranch), [
+                {"id": id, "id_store": 1, "description": "Branch", "latitude": 0, "longitude": 0, "lat_cell": 0, "lon_cell": 0}
+                for id in (1, 2)
+            ])
+            await connection.execute(insert(Product), [{
+                "id": 1, "name": "Product", "description": "d", "measure": 1, "measure_type": MeasureType.WEIGHT,
+                "type": "t", "origin": "o", "expiration": 1,
+            }])
+            await connection.execute(insert(Offer), [
+                {"id": 1, "id_product": 1, "id_store_branch": 1, "current_price": 5.0, "expiration": YESTERDAY},
+                {"id": 2, "id_product": 1, "id_store_branch": 2, "current_price": 8.0, "expiration": TODAY},
+            ])
+            await connection.execute(insert(ProductPriceStats), [{
+                "id_product": 1, "min_price": 5.0, "avg_price": 6.5, "offer_count": 2, "discount_pct": 23.08,
+                "valid_until": YESTERDAY, "id_best_offer": 1,
+            }])
+
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                products = await routes.utils.list_all_products(10, 0, 0.0, 0.0, session)
+                stats = await session.get(ProductPriceStats, 1)
+            return products, stats
+        finally:
+            await engine.dispose()
+
+    products, stats = asyncio.run(run())
+    assert [product["id"] for product in products] == [1]
+    assert (stats.min_price, stats.offer_count, stats.valid_until, stats.id_best_offer) == (8.0, 1, TODAY, 2)
+    assert routes.utils._price_stats_refreshed_on == TODAY
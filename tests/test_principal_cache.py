@@ -0,0 +1,77 @@
+from database.database import SessionLocal
+from database.models import User
+from dependencies import principal_cache
+from routes.auth_routes import create_token
+
+import pytest
+
+# Usuário próprio do teste no banco compartilhado, com um token emitido antes das mudanças
+@pytest.fixture
+def user(client, request):
+    with SessionLocal() as session:
+        user = User("Cached", f"{request.node.name}@qtota.local", "hash")
+        session.add(user)
+        session.commit()
+        id_user = user.id
+
+    yield id_user, {"Authorization": f"Bearer {create_token(id_user)}"}
+
+    principal_cache.delete(id_user)
+    with SessionLocal() as session:
+        user = session.get(User, id_user)
+        if user is not None:
+            session.delete(user)
+            session.commit()
+
+def update_user(id_user, **values):
+    with SessionLocal() as session:
+        user = session.get(User, id_user)
+        for attr, value in values.items():
+            setattr(user, attr, value)
+        session.commit()
+
+def test_password_change_evicts_principal(client, user):
+    id_user, headers = user
+    assert client.get("/auth/refresh", headers=headers).status_code == 200
+    assert principal_cache.get(id_user).password == "hash"
+
+    update_user(id_user, password="new hash")
+    assert principal_cache.get(id_user) is None
+
+    assert client.get("/auth/refresh", headers=headers).status_code == 200
+    assert principal_cache.get(id_user).password == "new hash"
+
+# Revogar a permissão vale para o token já emitido, sem esperar o TTL do cache
+def test_admin_change_evicts_principal(client, user):
+    id_user, headers = user
+    assert client.post("/offer/ingest", headers=headers, content=b"").status_code == 403
+
+    update_user(id_user, is_admin=True)
+    assert client.post("/offer/ingest", headers=headers, content=b"").status_code == 200
+    assert principal_cache.get(id_user).is_admin
+
+    update_user(id_user, is_admin=False)
+    assert principal_cache.get(id_user) is None
+    assert client.post("/offer/ingest", headers=headers, content=b"").status_code == 403
+
+def test_user_deletion_evicts_principal(client, user):
+    id_user, headers = user
+    assert client.get("/auth/refresh", headers=headers).status_code == 200
+
+    with SessionLocal() as session:
+        session.delete(session.get(User, id_user))
+        session.commit()
+    assert principal_cache.get(id_user) is None
+
+    assert client.get("/auth/refresh", headers=headers).status_code == 401
+
+# Mudança desfeita (rollback) não invalida: o usuário continua em cache
+def test_rolled_back_change_keeps_principal(client, user):
+    id_user, headers = user
+    assert client.get("/auth/refresh", headers=headers).status_code == 200
+
+    with SessionLocal() as session:
+        session.get(User, id_user).password = "new hash"
+        session.flush()
+        session.rollback()
+    assert principal_cache.get(id_user).password == "hash"
@@ -0,0 +1,61 @@
+from conftest import USER_LAT, USER_LON
+from routes.utils import get_store_baskets
+
+def post_batch(client, ids):
+    return client.post("/product/batch", json={"ids": ids, "lat": USER_LAT, "lon": USER_LON})
+
+def offer(id_store, current_price):
+    return {"id": id_store, "name": f"Store {id_store}", "logo": None, "current_price": current_price}
+
+def test_batch_accepts_up_to_100_ids(client):
+    response = post_batch(client, list(range(1, 101)))
+    assert response.status_code == 200
+    assert len(response.json()["products"]) == 100
+
+    assert post_batch(client, list(range(1, 102))).status_code == 422
+    assert post_batch(client, []).status_code == 422
+
+# Cada produto vem como em GET /product/{id}; id inexistente vem null e não entra nas listas
+def test_batch_products_match_single_product_route(client):
+    ids = [3, 1, 2, 999999]
+    products = post_batch(client, ids).json()["products"]
+
+    assert list(products) == ["3", "1", "2", "999999"]
+    assert products["999999"] is None
+    for id in ids[:3]:
+        single = client.get(f"/product/{id}", params={"lat": USER_LAT, "lon": USER_LON}).json()
+        assert products[str(id)] == single
+
+# As listas por loja somam o menor preço de cada produto entre as filiais próximas da loja
+def test_batch_baskets_use_cheapest_offer_per_store(client):
+    response = post_batch(client, list(range(1, 31)) + [999999]).json()
+
+    expected = {}
+    for id, product in response["products"].items():
+        for store_offer in product["stores"] if product else []:
+            prices = expected.setdefault(store_offer["id"], {})
+            prices[int(id)] = min(prices.get(int(id), store_offer["current_price"]), store_offer["current_price"])
+
+    baskets = response["baskets"]
+    assert len(baskets) > 1
+    assert {basket["id"] for basket in baskets} == set(expected)
+    for basket in baskets:
+        assert basket["total"] == round(sum(expected[basket["id"]].values()), 2)
+        assert basket["items"] == len(expected[basket["id"]])
+        assert 999999 not in basket["missing"]
+    assert baskets == sorted(baskets, key=lambda basket: (len(basket["missing"]), basket["total"], basket["id"]))
+
+def test_store_baskets_order():
+    products = {
+        1: {"stores": [offer(1, 10.0), offer(1, 8.0), offer(2, 9.0), offer(3, 1.0)]},
+        2: {"stores": [offer(1, 5.0), offer(2, 5.0)]},
+        3: None,
+    }
+    baskets = get_store_baskets(products)
+
+    # lojas com a lista completa primeiro, da mais barata; depois as que não têm algum produto
+    assert [(basket["id"], basket["total"], basket["items"], basket["missing"]) for basket in baskets] == [
+        (1, 13.0, 2, []),
+        (2, 14.0, 2, []),
+        (3, 1.0, 1, [2]),
+    ]
@@ -0,0 +1,50 @@
+from conftest import USER_LAT, USER_LON
+from database.database import engine, async_engine
+from sqlalchemy import event
+
+import pytest
+import re
+
+# percorrer offer ou product inteiros (com ou sem índice) em vez de buscar pelas chaves
+FULL_SCAN = re.compile(r"\bSCAN (offer|product)\b")
+
+HOT_REQUESTS = [
+    ("GET", "/home/", {"params": {"lat": USER_LAT, "lon": USER_LON}}),
+    ("GET", "/product/", {"params": {"lat": USER_LAT, "lon": USER_LON, "limit": 20}}),
+    ("GET", "/product/", {"params": {"lat": USER_LAT, "lon": USER_LON, "id_category": 1, "page": 2}}),
+    ("GET", "/product/", {"params": {"lat": USER_LAT, "lon": USER_LON, "cursor": ""}}),
+    ("GET", "/product/1", {"params": {"lat": USER_LAT, "lon": USER_LON}}),
+    ("POST", "/product/batch", {"json": {"ids": list(range(1, 41)), "lat": USER_LAT, "lon": USER_LON}}),
+    ("GET", "/product/best-offers", {"params": {"lat": USER_LAT, "lon": USER_LON}}),
+    ("GET", "/store/nearby", {"params": {"lat": USER_LAT, "lon": USER_LON, "limit": 5}}),
+    ("GET", "/store/1/products", {"params": {"lat": USER_LAT, "lon": USER_LON}}),
+]
+
+# Consultas (com os parâmetros) executadas pelo engine das rotas durante o teste
+@pytest.fixture
+def statements():
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    yield captured
+    event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+
+def query_plan(statement, parameters):
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, tuple(parameters)).all()
+    return [row[-1] for row in rows]
+
+# Cada consulta das rotas mais usadas precisa chegar a offer e product pelos índices
+@pytest.mark.parametrize("method, url, kwargs", HOT_REQUESTS, ids=[url for _, url, _ in HOT_REQUESTS])
+def test_hot_queries_use_indexes(client, store_branch_index_ready, statements, method, url, kwargs):
+    response = client.request(method, url, **kwargs)
+    assert response.status_code == 200
+
+    for statement, parameters in statements:
+        plan = query_plan(statement, parameters)
+        scans = [step for step in plan if FULL_SCAN.search(step)]
+        assert not scans, f"{statement}\n" + "\n".join(plan)
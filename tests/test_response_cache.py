@@ -0,0 +1,113 @@
+from cache import MemoryCacheBackend, RedisCacheBackend, ResponseCache
+from database.models import Offer
+from routes.geo_index import StoreBranchIndex
+from datetime import date
+
+import cache
+import pytest
+
+# Redis é opcional (RESPONSE_CACHE=redis); o backend é testado contra o fakeredis
+fakeredis = pytest.importorskip("fakeredis")
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+def test_memory_entry_expires_after_ttl(clock):
+    backend = MemoryCacheBackend(10)
+    backend.set("a", {"x": 1}, ttl=60)
+
+    clock.now += 60
+    assert backend.get("a") == {"x": 1}
+    clock.now += 1
+    assert backend.get("a") is None
+    assert backend.size() == 0
+
+# O despejo tira a entrada usada há mais tempo, não a gravada há mais tempo
+def test_memory_evicts_least_recently_used(clock):
+    backend = MemoryCacheBackend(2)
+    backend.set("a", 1, ttl=60)
+    backend.set("b", 2, ttl=60)
+    assert backend.get("a") == 1
+
+    backend.set("c", 3, ttl=60)
+    assert backend.get("b") is None
+    assert backend.get("a") == 1
+    assert backend.get("c") == 3
+
+# Os contadores de versão não entram no LRU
+def test_memory_counters_survive_eviction(clock):
+    backend = MemoryCacheBackend(1)
+    backend.incr("version:1:1")
+    backend.set("a", 1, ttl=60)
+    backend.set("b", 2, ttl=60)
+    assert backend.counters(["version:1:1", "version"]) == [1, 0]
+
+def test_redis_backend_round_trip():
+    client = fakeredis.FakeRedis()
+    backend = RedisCacheBackend(client)
+
+    backend.set("a", {"expiration": date(2026, 1, 2), "prices": [1.5, 2]}, ttl=60)
+    assert backend.get("a") == {"expiration": "2026-01-02", "prices": [1.5, 2]}
+    assert client.ttl("qtota:a") == 60
+
+    backend.delete("a")
+    assert backend.get("a") is None
+
+    assert backend.incr("version:1:1") == 1
+    assert backend.counters(["version:1:1", "version"]) == [1, 0]
+
+def test_redis_invalidate_area_changes_key():
+    response_cache = ResponseCache(RedisCacheBackend(fakeredis.FakeRedis()), ttl=60)
+    key = response_cache.key("home", 0.0, 0.0, [1, 2])
+    response_cache.set(key, {"products": []})
+    assert response_cache.get(key) == {"products": []}
+
+    response_cache.invalidate_area(0.0, 0.0)
+    new_key = response_cache.key("home", 0.0, 0.0, [1, 2])
+    assert new_key != key
+    assert response_cache.get(new_key) is None
+
+# Uma oferta gravada (e commitada) incrementa a versão da região das filiais e a próxima
+# leitura dali é um miss; regiões fora do raio da filial não são afetadas
+def test_offer_write_invalidates_region(memory_session, monkeypatch):
+    response_cache = ResponseCache(MemoryCacheBackend(100), ttl=60)
+    index = StoreBranchIndex()
+    index.upsert(1, 0.0, 0.0)
+    monkeypatch.setattr(cache, "response_cache", response_cache)
+    monkeypatch.setattr(cache, "store_branch_index", index)
+
+    near = response_cache.key("home", 0.0, 0.0, [1])
+    far = response_cache.key("home", 10.0, 10.0, [])
+    response_cache.set(near, {"products": []})
+    response_cache.set(far, {"products": []})
+
+    memory_session.add(Offer(id_product=1, id_store_branch=1, current_price=10.0, expiration=date.today()))
+    memory_session.flush()
+    assert response_cache.key("home", 0.0, 0.0, [1]) == near
+
+    memory_session.commit()
+    assert response_cache.key("home", 0.0, 0.0, [1]) != near
+    assert response_cache.get(response_cache.key("home", 0.0, 0.0, [1])) is None
+    assert response_cache.get(response_cache.key("home", 10.0, 10.0, [])) == {"products": []}
+
+def test_rolled_back_offer_write_keeps_cache(memory_session, monkeypatch):
+    response_cache = ResponseCache(MemoryCacheBackend(100), ttl=60)
+    monkeypatch.setattr(cache, "response_cache", response_cache)
+
+    key = response_cache.key("home", 0.0, 0.0, [1])
+    memory_session.add(Offer(id_product=1, id_store_branch=1, current_price=10.0, expiration=date.today()))
+    memory_session.flush()
+    memory_session.rollback()
+
+    assert response_cache.key("home", 0.0, 0.0, [1]) == key
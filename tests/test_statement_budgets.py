@@ -0,0 +1,44 @@
+from conftest import USER_LAT, USER_LON
+from database.database import async_engine
+from routes.geo_index import store_branch_index
+from sqlalchemy import event
+
+import pytest
+
+# Número máximo de consultas por requisição nas rotas mais usadas (com o índice das filiais carregado)
+STATEMENT_BUDGETS = [
+    ("GET", "/home/", {"params": {"lat": USER_LAT, "lon": USER_LON}}, 3),
+    ("GET", "/product/", {"params": {"lat": USER_LAT, "lon": USER_LON, "limit": 20}}, 2),
+    ("GET", "/product/1", {"params": {"lat": USER_LAT, "lon": USER_LON}}, 1),
+    ("POST", "/product/batch", {"json": {"ids": list(range(1, 41)), "lat": USER_LAT, "lon": USER_LON}}, 1),
+]
+
+# Conta as consultas executadas pelo engine das rotas durante o teste
+@pytest.fixture
+def statement_count():
+    count = [0]
+
+    def increment(*args):
+        count[0] += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", increment)
+    yield count
+    event.remove(async_engine.sync_engine, "before_cursor_execute", increment)
+
+@pytest.mark.parametrize("method, url, kwargs, budget", STATEMENT_BUDGETS, ids=[url for _, url, _, _ in STATEMENT_BUDGETS])
+def test_statement_budget(client, statement_count, method, url, kwargs, budget):
+    assert store_branch_index.ready
+
+    response = client.request(method, url, **kwargs)
+    assert response.status_code == 200
+    assert statement_count[0] <= budget, f"{url}: {statement_count[0]} consultas (limite {budget})"
+
+# O lote de produtos faz as mesmas consultas com 1 ou 100 ids (sem uma consulta por produto)
+def test_product_batch_statement_count_is_constant(client, statement_count):
+    counts = []
+    for ids in ([1], list(range(1, 101))):
+        statement_count[0] = 0
+        response = client.post("/product/batch", json={"ids": ids, "lat": USER_LAT, "lon": USER_LON})
+        assert response.status_code == 200
+        counts.append(statement_count[0])
+    assert counts[0] == counts[1]
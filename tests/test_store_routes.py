@@ -0,0 +1,18 @@
+from conftest import USER_LAT, USER_LON
+from datetime import date
+
+import pytest
+
+# Cada produto da loja vem só com ofertas válidas das filiais da própria loja
+@pytest.mark.parametrize("id_store", [1, 2, 3])
+def test_store_products_only_list_valid_offers_of_the_store(client, id_store):
+    response = client.get(f"/store/{id_store}/products", params={"lat": USER_LAT, "lon": USER_LON, "limit": 50})
+    assert response.status_code == 200
+
+    products = response.json()
+    assert products
+    for product in products:
+        assert product["stores"]
+        for offer in product["stores"]:
+            assert offer["id"] == id_store
+            assert date.fromisoformat(offer["expiration_offer"]) >= date.today()